@@ -94,15 +94,15 @@ def revoke_token(token_id: int) -> bool:
         return False
 
 
-def check_token(token: str) -> bool:
-    """Check if a token is valid."""
+def find_token_id(token: str) -> Optional[int]:
+    """Return the ID of the active token matching a plaintext token, or None."""
     # Early validation for empty/None tokens
     if not token or not token.strip():
-        return False
+        return None
     
     # Check if database exists
     if not DB_PATH.exists():
-        return False
+        return None
     
     try:
         with get_session() as session:
@@ -113,15 +113,25 @@ def check_token(token: str) -> bool:
             for auth_token in active_tokens:
                 try:
                     if bcrypt.checkpw(token.encode('utf-8'), auth_token.token_hash.encode('utf-8')):
-                        return True
+                        return auth_token.id
                 except (ValueError, TypeError):
                     # Handle any bcrypt errors gracefully
                     continue
             
-            return False
+            return None
     except Exception:
         # Handle any database connection or query errors
-        return False
+        return None
+
+
+def check_token(token: str) -> bool:
+    """Check if a token is valid."""
+    return find_token_id(token) is not None
+
+
+def parse_budget_value(value: str, cast):
+    """Parse a budget CLI value; 'default' clears the override."""
+    return None if value == "default" else cast(value)
 
 
 def main():
@@ -134,6 +144,9 @@ def main():
         print("  uv run auth_cli.py list                 - List all tokens")
         print("  uv run auth_cli.py revoke <token_id>    - Revoke a token")
         print("  uv run auth_cli.py check <token>        - Check if token is valid")
+        print("  uv run auth_cli.py report [days] [limit] - Show top consumers (default 30 days, top 10)")
+        print("  uv run auth_cli.py budget <token_id> [daily=USD] [monthly=USD] [rpm=N]")
+        print("                                          - Set per-token limits ('default' clears one)")
         sys.exit(1)
     
     command = sys.argv[1]
@@ -193,6 +206,69 @@ def main():
         else:
             print("Token is invalid or revoked.")
     
+    elif command == "report":
+        import usage_store
+        usage_store.init_db()
+        
+        try:
+            days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+            limit = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+        except ValueError:
+            print("Error: days and limit must be numbers")
+            sys.exit(1)
+        
+        consumers = usage_store.top_consumers(days, limit)
+        if not consumers:
+            print(f"No usage in the last {days} days.")
+            return
+        
+        print(f"Top consumers, last {days} days (UTC)")
+        print(f"{'ID':<4} | {'Description':<24} | {'Runs':>6} | {'Input tok':>11} | {'Output tok':>10} | {'Tools':>6} | {'Wall':>8} | {'Cost USD':>9}")
+        print("-" * 100)
+        
+        for row in consumers:
+            desc = (row["description"] or "")[:24]
+            wall = f"{row['wall_seconds'] / 60:.1f}m"
+            print(f"{row['token_id']:<4} | {desc:<24} | {row['runs']:>6} | {row['input_tokens']:>11,} | {row['output_tokens']:>10,} | {row['tool_calls']:>6} | {wall:>8} | {row['cost_usd']:>9.2f}")
+    
+    elif command == "budget":
+        import usage_store
+        usage_store.init_db()
+        
+        if len(sys.argv) < 3:
+            print("Error: Please provide token ID")
+            sys.exit(1)
+        
+        fields = {}
+        try:
+            token_id = int(sys.argv[2])
+            for arg in sys.argv[3:]:
+                name, _, value = arg.partition("=")
+                if name == "daily":
+                    fields["daily_usd"] = parse_budget_value(value, float)
+                elif name == "monthly":
+                    fields["monthly_usd"] = parse_budget_value(value, float)
+                elif name == "rpm":
+                    fields["requests_per_minute"] = parse_budget_value(value, int)
+                else:
+                    print(f"Error: Unknown limit: {name}")
+                    sys.exit(1)
+        except ValueError:
+            print("Error: Token ID and limits must be numbers")
+            sys.exit(1)
+        
+        if fields:
+            usage_store.set_budget(token_id, **fields)
+        day_usd, month_usd = usage_store.spend(token_id)
+        with usage_store.get_session() as session:
+            budget = session.get(usage_store.TokenBudget, token_id)
+            overrides = {
+                label: "default" if budget is None or getattr(budget, name) is None else getattr(budget, name)
+                for label, name in (("daily", "daily_usd"), ("monthly", "monthly_usd"), ("rpm", "requests_per_minute"))
+            }
+        print(f"Token {token_id} limits: " + " ".join(f"{label}={value}" for label, value in overrides.items()))
+        print(f"Spent today: ${day_usd:.2f}, this month: ${month_usd:.2f}")
+    
     else:
         print(f"Unknown command: {command}")
         sys.exit(1)
@@ -167,8 +167,10 @@ async function sendMessage() {
   
   saveChatHistory();
   
+  let idempotencyKey = getIdempotencyKey();
+  
   // Get configuration, session, and credentials from storage
-  chrome.storage.local.get(['authToken', 'apiKey', 'sessionIds', 'n8nCredentials'], async (result) => {
+  chrome.storage.local.get(['authToken', 'apiKey', 'sessionIds', 'n8nCredentials', 'credentialsSync'], async (result) => {
     if (!result.authToken) {
       removeLoadingMessage(loadingMessage);
       addMessage('Error: Service auth token not configured. Please configure it in the extension popup.', 'assistant');
@@ -197,21 +199,47 @@ async function sendMessage() {
     const sessionIds = result.sessionIds || {};
     const sessionId = sessionIds[currentDomain] || null;
     
-    // Use SSE for streaming response
-    const response = await fetch(CONFIG.SERVICE_URL, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
+    // Send the credentials list, or only what changed since the server last stored it
+    const currentCredentials = compactCredentials(result.n8nCredentials);
+    let credentialsFields = credentialsRequestFields(currentCredentials, (result.credentialsSync || {})[apiUrl]);
+    
+    // Track session ID from result
+    let sessionIdReceived = null;
+    
+    // Assistant text streamed before the final result
+    let streamingMessage = null;
+    let streamedText = '';
+    
+    // The server runs nothing when it no longer has the catalogue our hash or delta refers
+    // to; the request is then sent once more, at once, with the full list
+    let resendWithFullList = false;
+    
+    for (let attempt = 0; attempt < 2; attempt++) {
+      if (resendWithFullList) {
+        resendWithFullList = false;
+        credentialsFields = credentialsRequestFields(currentCredentials, null);
+        idempotencyKey = getIdempotencyKey();
+      }
+      
+      // Use SSE for streaming response
+      let response;
+      try {
+        response = await postChat({
           message: message,
           auth_token: result.authToken,
           api_key: result.apiKey,
           api_url: apiUrl,
+          page_url: window.location.href,
           session_id: sessionId,
-          n8n_credentials: result.n8nCredentials
-        })
-      });
+          ...credentialsFields,
+          idempotency_key: idempotencyKey,
+          stream_text: true
+        });
+      } catch (error) {
+        removeLoadingMessage(loadingMessage);
+        addMessage(`Error: ${error.message}`, 'assistant');
+        return;
+      }
       
       if (!response.ok) {
         removeLoadingMessage(loadingMessage);
@@ -220,9 +248,6 @@ async function sendMessage() {
         return;
       }
       
-      // Track session ID from result
-      let sessionIdReceived = null;
-      
       const reader = response.body.getReader();
       const decoder = new TextDecoder();
       let buffer = '';
@@ -246,22 +271,38 @@ async function sendMessage() {
               if (message.type === 'result') {
                 // Parse the data field which contains text and session_id
                 const resultData = JSON.parse(message.data);
-                // Final result - remove loading and show final message
+                // Final result - remove loading and show final message in place of the streamed text
                 removeLoadingMessage(loadingMessage);
-                addMessage(resultData.text, 'assistant');
+                if (streamingMessage) {
+                  updateMessage(streamingMessage, resultData.text);
+                  streamingMessage.classList.remove('streaming-message');
+                } else {
+                  addMessage(resultData.text, 'assistant');
+                }
                 sessionIdReceived = resultData.session_id;
+              } else if (message.type === 'assistant-text') {
+                streamedText += message.data;
+                if (!streamingMessage) {
+                  streamingMessage = addMessage(streamedText, 'assistant', loadingMessage);
+                  streamingMessage.classList.add('streaming-message');
+                } else {
+                  updateMessage(streamingMessage, streamedText);
+                }
+              } else if (message.type === 'tool-start') {
+                setLoadingText(loadingMessage, `Running ${message.data.name}...`);
+              } else if (message.type === 'tool-end') {
+                const seconds = (message.data.duration_ms / 1000).toFixed(1);
+                setLoadingText(loadingMessage, `${message.data.name} ${message.data.is_error ? 'failed' : 'finished'} after ${seconds}s`);
               } else if (message.type === 'error') {
                 removeLoadingMessage(loadingMessage);
                 addMessage(`Error: ${message.data}`, 'assistant');
                 return;
               } else if (message.type === 'progress-update') {
                 // Progress update (message ID or todo update)
-                if (loadingMessage) {
-                  const loadingText = loadingMessage.querySelector('.loading-text');
-                  if (loadingText) {
-                    loadingText.textContent = message.data;
-                  }
-                }
+                setLoadingText(loadingMessage, message.data);
+              } else if (message.type === 'credentials-sync') {
+                saveCredentialsSync(apiUrl, message.data, currentCredentials);
+                resendWithFullList = message.data.status === 'unknown' && attempt === 0;
               }
             } catch (e) {
               console.error('Failed to parse stream message:', e, dataStr);
@@ -270,12 +311,18 @@ async function sendMessage() {
         }
       }
       
-      // Store session ID if received
+      if (!resendWithFullList) break;
+    }
+    
+    
+      // Store session ID and request ID if received, so feedback can refer to them
       if (sessionIdReceived) {
-        chrome.storage.local.get(['sessionIds'], (storageResult) => {
+        chrome.storage.local.get(['sessionIds', 'lastRequestIds'], (storageResult) => {
           const sessionIds = storageResult.sessionIds || {};
+          const lastRequestIds = storageResult.lastRequestIds || {};
           sessionIds[currentDomain] = sessionIdReceived;
-          chrome.storage.local.set({ sessionIds: sessionIds });
+          lastRequestIds[currentDomain] = idempotencyKey;
+          chrome.storage.local.set({ sessionIds: sessionIds, lastRequestIds: lastRequestIds });
         });
       }
       
@@ -291,7 +338,71 @@ async function sendMessage() {
   });
 }
 
-function addMessage(text, sender) {
+// Every submission gets its own key, so sending "yes" or "continue" again starts a
+// new run; only postChat's transport retry of the same request reuses it
+function getIdempotencyKey() {
+  return crypto.randomUUID();
+}
+
+// id/name/type of each captured credential, the same list the server keeps
+function compactCredentials(n8nCredentials) {
+  const data = (n8nCredentials && n8nCredentials.rawResponse && n8nCredentials.rawResponse.data) || [];
+  return data
+    .filter(cred => cred && cred.id !== undefined && cred.id !== null)
+    .map(cred => ({ id: String(cred.id), name: cred.name || '', type: cred.type || '' }));
+}
+
+// Full list when the server has no catalogue for this instance yet, else its hash
+// and the entries added, changed or removed since
+function credentialsRequestFields(current, synced) {
+  if (!synced) {
+    return current.length ? { n8n_credentials: { rawResponse: { data: current } } } : {};
+  }
+  const previous = new Map(synced.credentials.map(cred => [cred.id, cred]));
+  const currentIds = new Set(current.map(cred => cred.id));
+  const upsert = current.filter(cred => {
+    const old = previous.get(cred.id);
+    return !old || old.name !== cred.name || old.type !== cred.type;
+  });
+  const remove = synced.credentials.filter(cred => !currentIds.has(cred.id)).map(cred => cred.id);
+  if (!upsert.length && !remove.length) {
+    return { credentials_hash: synced.hash };
+  }
+  return { credentials_delta: { base: synced.hash, upsert: upsert, remove: remove } };
+}
+
+// Remember the catalogue the server acknowledged; forget it when the server no longer
+// has it, so the next request sends the full list again
+function saveCredentialsSync(apiUrl, sync, credentials) {
+  chrome.storage.local.get(['credentialsSync'], (storageResult) => {
+    const credentialsSync = storageResult.credentialsSync || {};
+    if (sync.status === 'unknown' || !sync.hash) {
+      delete credentialsSync[apiUrl];
+    } else {
+      credentialsSync[apiUrl] = { hash: sync.hash, credentials: credentials };
+    }
+    chrome.storage.local.set({ credentialsSync: credentialsSync });
+  });
+}
+
+async function postChat(body) {
+  const options = {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(body)
+  };
+  try {
+    return await fetch(CONFIG.SERVICE_URL, options);
+  } catch (error) {
+    // Network hiccup: retry once with the same idempotency key
+    await new Promise(resolve => setTimeout(resolve, 1000));
+    return fetch(CONFIG.SERVICE_URL, options);
+  }
+}
+
+function addMessage(text, sender, beforeElement = null) {
   const messagesContainer = document.getElementById('chat-messages');
   const messageDiv = document.createElement('div');
   messageDiv.className = `message ${sender}-message`;
@@ -300,8 +411,27 @@ function addMessage(text, sender) {
   const content = sender === 'assistant' ? parseMarkdown(text) : escapeHtml(text);
   messageDiv.innerHTML = `<div class="message-content">${content}</div>`;
   
-  messagesContainer.appendChild(messageDiv);
+  // Streamed messages go above the loading indicator so it stays at the bottom
+  if (beforeElement && beforeElement.parentNode === messagesContainer) {
+    messagesContainer.insertBefore(messageDiv, beforeElement);
+  } else {
+    messagesContainer.appendChild(messageDiv);
+  }
   messagesContainer.scrollTop = messagesContainer.scrollHeight;
+  return messageDiv;
+}
+
+function updateMessage(messageDiv, text) {
+  const messagesContainer = document.getElementById('chat-messages');
+  messageDiv.querySelector('.message-content').innerHTML = parseMarkdown(text);
+  messagesContainer.scrollTop = messagesContainer.scrollHeight;
+}
+
+function setLoadingText(loadingElement, text) {
+  const loadingText = loadingElement && loadingElement.querySelector('.loading-text');
+  if (loadingText) {
+    loadingText.textContent = text;
+  }
 }
 
 function addLoadingMessage() {
@@ -332,6 +332,27 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   }
 
+  function getCurrentChatContext() {
+    // Session and last request of the chat on the active tab's domain
+    return new Promise((resolve) => {
+      chrome.tabs.query({active: true, currentWindow: true}, (tabs) => {
+        let domain = null;
+        try {
+          domain = new URL(tabs[0].url).hostname;
+        } catch (error) {
+          resolve({ sessionId: null, requestId: null });
+          return;
+        }
+        chrome.storage.local.get(['sessionIds', 'lastRequestIds'], (result) => {
+          resolve({
+            sessionId: (result.sessionIds || {})[domain] || null,
+            requestId: (result.lastRequestIds || {})[domain] || null
+          });
+        });
+      });
+    });
+  }
+
   function initializeFeedback() {
     // Feedback functionality
     const feedbackToggle = document.getElementById('feedbackToggle');
@@ -360,15 +381,17 @@ document.addEventListener('DOMContentLoaded', () => {
       try {
         const feedbackUrl = SERVICE_CONFIG.FEEDBACK_URL || `${SERVICE_CONFIG.SERVICE_URL}/feedback`;
         
+        const { sessionId, requestId } = await getCurrentChatContext();
+        
         console.log('Sending feedback to:', feedbackUrl);
-        console.log('Feedback data:', { feedback });
+        console.log('Feedback data:', { feedback, sessionId, requestId });
         
         const response = await fetch(feedbackUrl, {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
           },
-          body: JSON.stringify({ feedback })
+          body: JSON.stringify({ feedback, session_id: sessionId, request_id: requestId })
         });
         
         console.log('Response status:', response.status);
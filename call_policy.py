@@ -0,0 +1,203 @@
+"""
+Timeout, retry, hedging and circuit-breaker policy for backend tool calls.
+
+Every tool call forwarded to n8n-mcp runs under a CallPolicy: a timeout, a
+bounded number of attempts (only for idempotent tools) and, for reads against
+an n8n instance, a hedged duplicate request once the call is slower than usual.
+Repeated failures against one n8n api_url open a circuit breaker shared by all
+proxies on the host, so later calls fail fast instead of waiting on a dead
+instance.
+"""
+
+import json
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+
+import shared_state
+from workflow_cache import WORKFLOW_WRITE_TOOLS
+
+
+# Tools with side effects: never retried or hedged
+SIDE_EFFECT_TOOLS = WORKFLOW_WRITE_TOOLS | {
+    'n8n_create_workflow', 'n8n_delete_execution', 'n8n_trigger_webhook_workflow'
+}
+
+# Error text from n8n-mcp that indicates a transient network or server failure
+TRANSIENT_ERROR_MARKERS = (
+    'ECONNRESET', 'ECONNREFUSED', 'ETIMEDOUT', 'EAI_AGAIN', 'socket hang up',
+    'timeout', 'status code 429', 'status code 502', 'status code 503', 'status code 504'
+)
+
+RETRY_BASE_DELAY_SECONDS = 0.5
+RETRY_MAX_DELAY_SECONDS = 4.0
+
+# Latency samples kept per tool for the hedging threshold
+LATENCY_WINDOW = 50
+MIN_LATENCY_SAMPLES = 10
+
+
+@dataclass(frozen=True)
+class CallPolicy:
+    timeout_seconds: float
+    max_attempts: int = 1
+    # Send a duplicate request if no response arrived after this long (None = never)
+    hedge_after_seconds: float | None = None
+
+
+# Local documentation and validation tools answered by n8n-mcp itself
+LOCAL_POLICY = CallPolicy(timeout_seconds=30, max_attempts=2)
+# Reads against the user's n8n instance
+N8N_READ_POLICY = CallPolicy(timeout_seconds=30, max_attempts=3, hedge_after_seconds=3.0)
+# Writes against the user's n8n instance
+N8N_WRITE_POLICY = CallPolicy(timeout_seconds=60)
+
+TOOL_POLICIES = {
+    'n8n_trigger_webhook_workflow': CallPolicy(timeout_seconds=120),
+    'n8n_health_check': CallPolicy(timeout_seconds=10, max_attempts=2),
+}
+
+
+class CallPolicies:
+    """Resolve the policy of each tool, with per-tool overrides from config."""
+
+    def __init__(self, n8n_tools: set[str], overrides: dict | None = None):
+        self.n8n_tools = n8n_tools
+        self.policies = dict(TOOL_POLICIES)
+        for tool_name, fields in (overrides or {}).items():
+            self.policies[tool_name] = replace(self._default(tool_name), **fields)
+
+    def _default(self, tool_name: str) -> CallPolicy:
+        if tool_name in SIDE_EFFECT_TOOLS:
+            return N8N_WRITE_POLICY
+        if tool_name in self.n8n_tools:
+            return N8N_READ_POLICY
+        return LOCAL_POLICY
+
+    def get(self, tool_name: str) -> CallPolicy:
+        policy = self.policies.get(tool_name) or self._default(tool_name)
+        if tool_name in SIDE_EFFECT_TOOLS:
+            # Overrides cannot make a write retry or hedge
+            policy = replace(policy, max_attempts=1, hedge_after_seconds=None)
+        return policy
+
+
+class LatencyTracker:
+    """Recent call latencies per tool, used to hedge only unusually slow calls."""
+
+    def __init__(self):
+        self._samples: dict[str, deque] = {}
+
+    def record(self, tool_name: str, seconds: float) -> None:
+        self._samples.setdefault(tool_name, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def hedge_delay(self, tool_name: str, policy: CallPolicy) -> float | None:
+        """Hedge after the 95th percentile latency, but never sooner than the policy allows."""
+        if policy.hedge_after_seconds is None:
+            return None
+        samples = self._samples.get(tool_name)
+        if not samples or len(samples) < MIN_LATENCY_SAMPLES:
+            return policy.hedge_after_seconds
+        p95 = sorted(samples)[int(len(samples) * 0.95) - 1]
+        return max(policy.hedge_after_seconds, p95)
+
+
+class CircuitBreakers:
+    """Consecutive-failure circuit breakers per n8n api_url, shared through shared_state.
+
+    After failure_threshold consecutive failures the circuit opens for
+    reset_seconds. Once that has passed, one trial call is let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        # api_urls with recorded failures seen by this process; only these need a reset on success
+        self.failing: set[str] = set()
+
+    def retry_after(self, api_url: str) -> float | None:
+        """Return seconds until the circuit closes if calls must be rejected, else None."""
+        state = shared_state.cache_get("circuit", api_url)
+        if not state:
+            self.failing.discard(api_url)
+            return None
+        self.failing.add(api_url)
+        if state["failures"] < self.failure_threshold:
+            return None
+        now = time.time()
+        if now < state["open_until"]:
+            return state["open_until"] - now
+        # Half-open: let this call through and hold everyone else back until it finishes
+        state["open_until"] = now + self.reset_seconds
+        shared_state.cache_set("circuit", api_url, state, ttl_seconds=self.reset_seconds * 10)
+        return None
+
+    def record_success(self, api_url: str) -> None:
+        if api_url in self.failing:
+            self.failing.discard(api_url)
+            shared_state.cache_delete("circuit", api_url)
+
+    def record_failure(self, api_url: str) -> None:
+        self.failing.add(api_url)
+        state = shared_state.cache_get("circuit", api_url) or {"failures": 0, "open_until": 0.0}
+        state["failures"] += 1
+        if state["failures"] >= self.failure_threshold:
+            state["open_until"] = time.time() + self.reset_seconds
+        shared_state.cache_set("circuit", api_url, state, ttl_seconds=self.reset_seconds * 10)
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter before retry number `attempt` (1-based)."""
+    return random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+
+
+def is_transient_error(payload: dict | None) -> bool:
+    """Check whether a failed tool result looks like a transient network or server error."""
+    if not payload or payload.get("success") is not False:
+        return False
+    error = str(payload.get("error", "")) + str(payload.get("details", ""))
+    return any(marker.lower() in error.lower() for marker in TRANSIENT_ERROR_MARKERS)
+
+
+def timeout_error(tool_name: str, policy: CallPolicy, attempts: int) -> str:
+    """Structured result for a call that timed out on every attempt."""
+    return json.dumps({
+        "success": False,
+        "error": f"'{tool_name}' timed out after {policy.timeout_seconds:g}s ({attempts} attempt(s))",
+        "errorType": "timeout",
+        "retryable": tool_name not in SIDE_EFFECT_TOOLS,
+        "hint": (
+            "The n8n instance or the MCP server did not respond in time. "
+            + ("Check whether the change was applied before repeating it." if tool_name in SIDE_EFFECT_TOOLS
+               else "Try again later or narrow the request.")
+        )
+    })
+
+
+def circuit_open_error(api_url: str, retry_after: float) -> str:
+    """Structured result for a call rejected by an open circuit breaker."""
+    return json.dumps({
+        "success": False,
+        "error": f"The n8n instance at {api_url} is failing repeatedly; calls are paused",
+        "errorType": "circuit_open",
+        "retryable": True,
+        "retryAfterSeconds": round(retry_after, 1),
+        "hint": "Tell the user their n8n instance is not responding instead of retrying right away."
+    })
+
+
+def backend_restarted_error(tool_name: str) -> str:
+    """Structured result for a call lost because the MCP server process died."""
+    side_effect = tool_name in SIDE_EFFECT_TOOLS
+    return json.dumps({
+        "success": False,
+        "error": f"The MCP server stopped while running '{tool_name}' and was restarted",
+        "errorType": "backend_restarted",
+        "retryable": True,
+        "hint": (
+            "Check whether the change was applied before repeating it." if side_effect
+            else "The call was already retried once; try again."
+        )
+    })
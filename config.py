@@ -1,3 +1,4 @@
+import json
 import os
 from enum import Enum
 from typing import Optional
@@ -46,5 +47,150 @@ class Config:
         """Get appropriate log level."""
         return "DEBUG" if self.is_development else "INFO"
 
+    @property
+    def workflow_cache_fresh_seconds(self) -> float:
+        """Seconds a cached workflow snapshot is served without revalidation."""
+        return float(os.getenv("WORKFLOW_CACHE_FRESH_SECONDS", "10"))
+
+    @property
+    def result_byte_budget(self) -> int:
+        """Maximum size in bytes of a single tool result passed to Claude."""
+        return int(os.getenv("RESULT_BYTE_BUDGET", "65536"))
+
+    @property
+    def session_rollover_bytes(self) -> int:
+        """Transcript size above which a session is rolled over instead of resumed."""
+        return int(os.getenv("SESSION_ROLLOVER_BYTES", str(2 * 1024 * 1024)))
+
+    @property
+    def session_max_age_days(self) -> int:
+        """Days after which unused sessions and their transcripts are deleted."""
+        return int(os.getenv("SESSION_MAX_AGE_DAYS", "14"))
+
+    @property
+    def chat_dedup_window_seconds(self) -> float:
+        """Seconds a finished run is replayed to duplicate /chat requests."""
+        return float(os.getenv("CHAT_DEDUP_WINDOW_SECONDS", "60"))
+
+    @property
+    def workers(self) -> int:
+        """Number of uvicorn worker processes."""
+        return int(os.getenv("WORKERS", "1"))
+
+    @property
+    def max_concurrent_runs(self) -> int:
+        """Maximum Claude runs in flight across all workers."""
+        return int(os.getenv("MAX_CONCURRENT_RUNS", "8"))
+
+    @property
+    def admission_timeout_seconds(self) -> float:
+        """How long a request waits for a free run slot before being rejected."""
+        return float(os.getenv("ADMISSION_TIMEOUT_SECONDS", "60"))
+
+    @property
+    def admin_token(self) -> Optional[str]:
+        """Token required by admin endpoints; they are disabled when unset."""
+        return os.getenv("ADMIN_TOKEN") or None
+
+    @property
+    def run_max_rss_mb(self) -> int:
+        """Resident memory limit in MiB for one Claude process tree (0 = unlimited)."""
+        return int(os.getenv("RUN_MAX_RSS_MB", "0"))
+
+    @property
+    def run_max_cpu_seconds(self) -> float:
+        """CPU time limit for one Claude process tree (0 = unlimited)."""
+        return float(os.getenv("RUN_MAX_CPU_SECONDS", "0"))
+
+    @property
+    def run_max_wall_seconds(self) -> float:
+        """Wall-clock limit for one Claude run (0 = unlimited)."""
+        return float(os.getenv("RUN_MAX_WALL_SECONDS", "0"))
+
+    @property
+    def run_cgroup_root(self) -> Optional[str]:
+        """Writable cgroup v2 directory under which each run gets its own cgroup."""
+        return os.getenv("RUN_CGROUP_ROOT") or None
+
+    @property
+    def tool_policies(self) -> dict:
+        """Per-tool call policy overrides, e.g. {"n8n_list_executions": {"timeout_seconds": 20}}."""
+        return json.loads(os.getenv("TOOL_POLICIES", "{}"))
+
+    @property
+    def circuit_failure_threshold(self) -> int:
+        """Consecutive failures against one n8n instance that open its circuit breaker."""
+        return int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+
+    @property
+    def circuit_reset_seconds(self) -> float:
+        """Seconds an open circuit breaker rejects calls before letting a trial call through."""
+        return float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+    @property
+    def backend_health_interval_seconds(self) -> float:
+        """Seconds between health checks of the n8n-mcp backend process."""
+        return float(os.getenv("BACKEND_HEALTH_INTERVAL_SECONDS", "15"))
+
+    @property
+    def backend_max_rss_mb(self) -> int:
+        """Resident memory in MiB above which the backend is replaced once idle (0 = unlimited)."""
+        return int(os.getenv("BACKEND_MAX_RSS_MB", "1024"))
+
+    @property
+    def backend_recycle_calls(self) -> int:
+        """Replace the backend after this many tool calls (0 = never)."""
+        return int(os.getenv("BACKEND_RECYCLE_CALLS", "0"))
+
+    @property
+    def log_payload_sample_rate(self) -> float:
+        """Fraction of proxy tool calls whose (redacted, truncated) arguments are logged at DEBUG level."""
+        return float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+
+    @property
+    def prefetch_workflows(self) -> bool:
+        """Prefetch the workflow on the user's page while a /chat request starts up."""
+        return os.getenv("PREFETCH_WORKFLOWS", "true").lower() == "true"
+
+    @property
+    def prefetch_fresh_seconds(self) -> float:
+        """Seconds a prefetched workflow is served to the run's proxy without revalidation."""
+        return float(os.getenv("PREFETCH_FRESH_SECONDS", "60"))
+
+    @property
+    def token_daily_budget_usd(self) -> float:
+        """Default daily spend limit per auth token, Claude and OpenAI together (0 = unlimited)."""
+        return float(os.getenv("TOKEN_DAILY_BUDGET_USD", "0"))
+
+    @property
+    def token_monthly_budget_usd(self) -> float:
+        """Default calendar-month spend limit per auth token (0 = unlimited)."""
+        return float(os.getenv("TOKEN_MONTHLY_BUDGET_USD", "0"))
+
+    @property
+    def token_requests_per_minute(self) -> int:
+        """Default number of /chat runs an auth token may start per minute (0 = unlimited)."""
+        return int(os.getenv("TOKEN_REQUESTS_PER_MINUTE", "0"))
+
+    @property
+    def drain_timeout_seconds(self) -> float:
+        """How long a draining server lets running chats finish before cancelling them (0 = no limit)."""
+        return float(os.getenv("DRAIN_TIMEOUT_SECONDS", "600"))
+
+    @property
+    def routing_enabled(self) -> bool:
+        """Route simple read-only messages to a direct answer or a lighter Claude run."""
+        return os.getenv("ROUTING_ENABLED", "true").lower() == "true"
+
+    @property
+    def router_model(self) -> Optional[str]:
+        """OpenAI model that routes messages the local rules cannot classify (unset = full agent)."""
+        return os.getenv("ROUTER_MODEL") or None
+
+    @property
+    def light_model(self) -> Optional[str]:
+        """Claude model for light-tier runs (unset = the default model)."""
+        return os.getenv("LIGHT_MODEL", "haiku") or None
+
 # Global config instance
 config = Config()
\ No newline at end of file
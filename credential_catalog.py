@@ -0,0 +1,137 @@
+"""
+Server-side catalogue of each n8n instance's credentials.
+
+The extension sends the full id/name/type list once per instance. The server
+stores it in the shared state broker under the instance host and the list's
+content hash, and tells the extension that hash. Later requests carry only the
+hash, or a delta (upserted and removed entries) against it. Catalogues are
+parsed and indexed by type once per process and kept in a small LRU, so neither
+the proxy nor main.py re-parse or re-format the list per request.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import urlparse
+
+import shared_state
+from credentials_context import compact_credentials, credentials_hash, format_credentials_context, normalize_credentials
+
+# Catalogues not used for this long are dropped; the extension then sends the full list again
+CATALOG_TTL_SECONDS = 30 * 24 * 3600
+# How often a catalogue in use has its expiry pushed back
+CATALOG_TOUCH_SECONDS = 24 * 3600
+# Parsed catalogues kept in memory per process
+MAX_LOADED_CATALOGS = 32
+
+# Sync outcomes reported to the extension
+SYNC_STORED = "stored"
+SYNC_UPDATED = "updated"
+SYNC_UNCHANGED = "unchanged"
+# The server does not have the catalogue the extension referred to: the request is not run
+# and the extension resends it at once with the full list
+SYNC_UNKNOWN = "unknown"
+
+
+class CredentialCatalog:
+    """A normalised credentials list indexed by lowercased type."""
+
+    def __init__(self, credentials: list[dict]):
+        self.credentials = normalize_credentials(credentials)
+        self.hash = credentials_hash(self.credentials)
+        self.by_type: dict[str, list[dict]] = {}
+        for cred in self.credentials:
+            self.by_type.setdefault(cred["type"].lower(), []).append(cred)
+        self._context: Optional[str] = None
+        # When this process last saved the catalogue to shared state
+        self.saved_at = 0.0
+
+    def find(self, cred_type: Optional[str] = None, name: Optional[str] = None) -> list[dict]:
+        """Credentials whose type and/or name contain the given case-insensitive substrings."""
+        if cred_type:
+            cred_type = cred_type.lower()
+            results = [cred for type_key, creds in self.by_type.items() if cred_type in type_key for cred in creds]
+        else:
+            results = self.credentials
+        if name:
+            results = [cred for cred in results if name.lower() in cred["name"].lower()]
+        return results
+
+    def context(self) -> str:
+        """The prompt context for this catalogue, formatted once."""
+        if self._context is None:
+            self._context = format_credentials_context(self.credentials)
+        return self._context
+
+    def apply_delta(self, upsert: list, remove: list) -> "CredentialCatalog":
+        """A new catalogue with entries upserted by ID and removed IDs dropped."""
+        removed = {str(cred_id) for cred_id in remove}
+        by_id = {cred["id"]: cred for cred in self.credentials if cred["id"] not in removed}
+        for cred in normalize_credentials(upsert):
+            by_id[cred["id"]] = cred
+        return CredentialCatalog(list(by_id.values()))
+
+
+_loaded: OrderedDict[str, CredentialCatalog] = OrderedDict()
+
+
+def catalog_key(api_url: str, catalog_hash: str) -> str:
+    """Shared state key of an instance's catalogue version."""
+    return f"{urlparse(api_url).netloc or api_url}:{catalog_hash}"
+
+
+def _remember(key: str, catalog: CredentialCatalog) -> None:
+    _loaded[key] = catalog
+    _loaded.move_to_end(key)
+    while len(_loaded) > MAX_LOADED_CATALOGS:
+        _loaded.popitem(last=False)
+
+
+def store(api_url: str, catalog: CredentialCatalog) -> str:
+    """Save a catalogue for an instance and return its key."""
+    key = catalog_key(api_url, catalog.hash)
+    shared_state.cache_set("credential_catalog", key, catalog.credentials, CATALOG_TTL_SECONDS)
+    catalog.saved_at = time.time()
+    _remember(key, catalog)
+    return key
+
+
+def _use(api_url: str, catalog: CredentialCatalog) -> CredentialCatalog:
+    """The loaded copy of a catalogue, saved if it is new or has not been saved for a while."""
+    key = catalog_key(api_url, catalog.hash)
+    catalog = load(key) or catalog
+    if time.time() - catalog.saved_at > CATALOG_TOUCH_SECONDS:
+        store(api_url, catalog)
+    return catalog
+
+
+def load(key: str) -> Optional[CredentialCatalog]:
+    """A stored catalogue by key, or None if it is unknown or expired."""
+    catalog = _loaded.get(key)
+    if catalog is not None:
+        _loaded.move_to_end(key)
+        return catalog
+    credentials = shared_state.cache_get("credential_catalog", key)
+    if credentials is None:
+        return None
+    catalog = CredentialCatalog(credentials)
+    _remember(key, catalog)
+    return catalog
+
+
+def resolve(api_url: str, n8n_credentials: Optional[dict], catalog_hash: Optional[str],
+            delta: Optional[dict]) -> tuple[Optional[CredentialCatalog], Optional[str]]:
+    """Find the request's catalogue from a full list, a delta or a bare hash; returns (catalogue, sync status)."""
+    if n8n_credentials:
+        return _use(api_url, CredentialCatalog(compact_credentials(n8n_credentials))), SYNC_STORED
+    if delta:
+        base = load(catalog_key(api_url, str(delta.get("base"))))
+        if base is None:
+            return None, SYNC_UNKNOWN
+        return _use(api_url, base.apply_delta(delta.get("upsert") or [], delta.get("remove") or [])), SYNC_UPDATED
+    if catalog_hash:
+        catalog = load(catalog_key(api_url, catalog_hash))
+        if catalog is None:
+            return None, SYNC_UNKNOWN
+        return _use(api_url, catalog), SYNC_UNCHANGED
+    return None, None
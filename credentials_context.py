@@ -0,0 +1,59 @@
+"""
+Compact n8n credentials context for the Claude prompt.
+"""
+
+import hashlib
+import json
+
+
+# Above this many credentials only a per-type summary goes into the prompt
+MAX_INLINE_CREDENTIALS = 50
+
+
+def compact_credentials(n8n_credentials: dict | None) -> list[dict]:
+    """Extract id/name/type from the raw /credentials response, deduplicated and sorted."""
+    if not n8n_credentials:
+        return []
+    return normalize_credentials((n8n_credentials.get('rawResponse') or {}).get('data') or [])
+
+
+def normalize_credentials(entries: list) -> list[dict]:
+    """Reduce credential entries to id/name/type, deduplicated by ID and sorted."""
+    by_id = {}
+    for cred in entries:
+        if not isinstance(cred, dict):
+            continue
+        entry = {
+            "id": str(cred.get('id', 'unknown')),
+            "name": cred.get('name', 'Unknown'),
+            "type": cred.get('type', 'unknown')
+        }
+        by_id[entry["id"]] = entry
+    return sorted(by_id.values(), key=lambda cred: (cred["type"], cred["name"], cred["id"]))
+
+
+def credentials_hash(credentials: list[dict]) -> str:
+    """Content hash of a compact credentials list."""
+    canonical = json.dumps(credentials, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def format_credentials_context(credentials: list[dict]) -> str:
+    """Render credentials grouped by type, or a per-type summary for large instances."""
+    by_type: dict[str, list[dict]] = {}
+    for cred in credentials:
+        by_type.setdefault(cred["type"], []).append(cred)
+
+    if len(credentials) > MAX_INLINE_CREDENTIALS:
+        lines = [f"- {cred_type}: {len(creds)}" for cred_type, creds in by_type.items()]
+        return (
+            f"Available n8n credentials ({len(credentials)}, count per type). "
+            "Use the lookup_n8n_credentials tool to get IDs by type or name:\n" + "\n".join(lines)
+        )
+
+    lines = [
+        f"- {cred_type}: " + ", ".join(f"{cred['name']} (ID: {cred['id']})" for cred in creds)
+        for cred_type, creds in by_type.items()
+    ]
+    return "Available n8n credentials you can reference by ID, by type:\n" + "\n".join(lines)
+
@@ -0,0 +1,86 @@
+"""
+Graceful drain and zero-downtime restarts.
+
+main.py listens on a socket with SO_REUSEPORT (or one passed in by systemd), so
+a new server can listen on the same address while the old one is still running.
+Once the new server's workers are up they send SIGTERM to the previous server.
+uvicorn then stops accepting connections and waits up to DRAIN_TIMEOUT_SECONDS
+for open /chat streams to finish before cancelling them. Meanwhile this module's
+flag makes the old server refuse new chat requests and fail health checks.
+"""
+
+import os
+import signal
+import socket
+import time
+from pathlib import Path
+from typing import Optional
+
+import shared_state
+
+# File descriptor of the first socket passed with systemd socket activation
+SD_LISTEN_FDS_START = 3
+
+_draining_since: Optional[float] = None
+
+
+def draining() -> bool:
+    """Whether this process has started draining."""
+    return _draining_since is not None
+
+
+def start_draining(reason: str) -> None:
+    """Stop admitting new chat requests in this process."""
+    global _draining_since
+    if _draining_since is None:
+        _draining_since = time.time()
+        print(f"Draining ({reason}): refusing new chat requests, waiting for running ones")
+
+
+def install_signal_hook() -> None:
+    """Start draining on SIGTERM/SIGINT before uvicorn's own handler begins its graceful shutdown."""
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(signum)
+
+        def handler(received, frame, previous=previous):
+            start_draining(signal.Signals(received).name)
+            if callable(previous):
+                previous(received, frame)
+
+        signal.signal(signum, handler)
+
+
+def listening_socket(host: str, port: int) -> socket.socket:
+    """The socket passed by systemd, else a new one bound with SO_REUSEPORT."""
+    if os.getenv("LISTEN_PID") == str(os.getpid()) and int(os.getenv("LISTEN_FDS", "0")) >= 1:
+        return socket.socket(fileno=SD_LISTEN_FDS_START)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _start_time(pid: int) -> Optional[int]:
+    """Process start time in clock ticks, so a recycled PID is not mistaken for the server."""
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return None
+    return int(stat[stat.rfind(")") + 2:].split()[19])
+
+
+def take_over(address: str, server_pid: int) -> Optional[int]:
+    """Register server_pid as the server on address and send SIGTERM to the one it replaces."""
+    current = {"pid": server_pid, "started": _start_time(server_pid)}
+    # One atomic swap, so of several workers starting together only the first sees the old server
+    previous = shared_state.cache_swap("server", address, current)
+    if not previous or previous == current or _start_time(previous["pid"]) != previous["started"]:
+        return None
+    try:
+        os.kill(previous["pid"], signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return None
+    return previous["pid"]
@@ -0,0 +1,125 @@
+"""
+Feedback storage: an in-memory queue drained into SQLite by a background writer.
+"""
+
+import asyncio
+import csv
+import io
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, Text
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker, Session
+
+DB_PATH = Path(__file__).parent / "feedback.db"
+
+# Maximum entries written in one transaction
+MAX_BATCH_SIZE = 100
+
+Base = declarative_base()
+
+
+class Feedback(Base):
+    __tablename__ = 'feedback'
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    feedback = Column(Text, nullable=False)
+    session_id = Column(String, nullable=True, index=True)
+    request_id = Column(String, nullable=True)
+
+
+_engine = None
+
+
+def get_engine():
+    """Get SQLAlchemy engine, with WAL so exports do not block writes."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(f"sqlite:///{DB_PATH}")
+
+        @event.listens_for(_engine, "connect")
+        def _set_wal(dbapi_connection, _record):
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    return _engine
+
+
+def get_session() -> Session:
+    """Get SQLAlchemy session."""
+    SessionLocal = sessionmaker(bind=get_engine())
+    return SessionLocal()
+
+
+def init_db():
+    """Initialize the database with the feedback table."""
+    Base.metadata.create_all(get_engine())
+
+
+def insert_batch(entries: List[dict]) -> None:
+    """Insert a batch of feedback entries in one transaction."""
+    with get_session() as session:
+        session.add_all([Feedback(**entry) for entry in entries])
+        session.commit()
+
+
+def export_csv(batch_size: int = 500) -> Iterator[str]:
+    """Yield all feedback as CSV, oldest first, without loading it all at once."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['timestamp', 'feedback', 'session_id', 'request_id'])
+    yield buffer.getvalue()
+
+    with get_session() as session:
+        query = session.query(Feedback).order_by(Feedback.created_at).yield_per(batch_size)
+        for entry in query:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow([entry.created_at.isoformat(), entry.feedback, entry.session_id or '', entry.request_id or ''])
+            yield buffer.getvalue()
+
+
+class FeedbackWriter:
+    """Background task that batches queued feedback into the database."""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start draining the queue."""
+        self.task = asyncio.create_task(self._run())
+
+    def submit(self, feedback: str, session_id: Optional[str] = None, request_id: Optional[str] = None) -> None:
+        """Queue a feedback entry; never touches disk."""
+        self.queue.put_nowait({
+            'created_at': datetime.utcnow(),
+            'feedback': feedback,
+            'session_id': session_id,
+            'request_id': request_id
+        })
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < MAX_BATCH_SIZE and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await self._write(batch)
+
+    async def _write(self, batch: List[dict]) -> None:
+        try:
+            await asyncio.to_thread(insert_batch, batch)
+        except Exception as e:
+            print(f"Error writing feedback: {e}")
+
+    async def stop(self) -> None:
+        """Stop the writer and flush whatever is still queued."""
+        if self.task:
+            self.task.cancel()
+        batch = []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if batch:
+            await self._write(batch)
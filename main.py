@@ -1,18 +1,29 @@
 import asyncio
 import os
-import csv
 import json
 from datetime import datetime
 from typing import Optional, Dict, List
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from openai import OpenAI
 import uuid
+import hashlib
+import signal
+import time
 from pathlib import Path
 from n8n_credential import N8NCredential
+import credential_catalog
 from config import config
+import session_registry
+import shared_state
+import feedback_store
+import usage_store
+import drain
+from process_tree import ProcessTree, TreeLimits, kill_live_trees, metrics as process_metrics
+from workflow_prefetch import WorkflowPrefetcher, prefetch_stats, workflow_id_from_url
+import request_router
+from request_router import Route, TIER_DIRECT, TIER_FULL, TIER_LIGHT
 
 from dotenv import load_dotenv
 
@@ -38,34 +49,98 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# OpenAI client, created on first use so importing main stays fast
+_openai_client = None
+
+def get_openai_client():
+    """Get the OpenAI client, importing the SDK on first use."""
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+        _openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _openai_client
+
+# Stable opening of every prompt; nothing request-specific goes before it
+PROMPT_PREAMBLE = "You are an n8n workflow creation and management expert. You have access to tools to create, update, and manage n8n workflows via API."
+
+# How long rephrased todo items are kept in the shared cache
+REPHRASE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+HOST = "127.0.0.1"
+PORT = 8000
+
+# Credential files older than this were left behind by a killed server
+STALE_CREDENTIALS_SECONDS = 24 * 3600
 
 class ChatRequest(BaseModel):
     message: str
     auth_token: str
     api_key: str
     api_url: str
+    # URL of the n8n page the user is on
+    page_url: Optional[str] = None
     session_id: Optional[str] = None
+    # Full credentials list; sent once per instance, later requests send only its hash or a delta
     n8n_credentials: Optional[Dict] = None
+    credentials_hash: Optional[str] = None
+    # {"base": hash, "upsert": [{id, name, type}], "remove": [id]} against a catalogue the server has
+    credentials_delta: Optional[Dict] = None
+    # Retries of one submission carry the same key and share one Claude run
+    idempotency_key: Optional[str] = None
+    # Stream assistant text and tool markers as they happen, not only the final result
+    stream_text: bool = False
 
 class FeedbackRequest(BaseModel):
     feedback: str
+    # The chat session and request the feedback refers to, if known; request_id is the chat
+    # request's idempotency key, also stored on its usage_turns row
+    session_id: Optional[str] = None
+    request_id: Optional[str] = None
+
+feedback_writer = feedback_store.FeedbackWriter()
+
+# n8n-mcp backend owned by this worker for prefetches and direct answers, started on first use
+_worker_mcp_client = None
+
+def worker_mcp_client():
+    """Get this worker's long-lived n8n-mcp client."""
+    global _worker_mcp_client
+    if _worker_mcp_client is None:
+        from mcp_calling import DirectMCPClient
+        _worker_mcp_client = DirectMCPClient().start()
+    return _worker_mcp_client
+
+prefetcher = WorkflowPrefetcher(config.prefetch_fresh_seconds, worker_mcp_client) if config.prefetch_workflows else None
+
+# Direct answers kept per session so a later Claude run knows what the user was shown
+DIRECT_CONTEXT_ANSWERS = 3
+DIRECT_CONTEXT_CHARS = 1500
+
+# How long a validated token lets prefetching start before validation finishes
+AUTH_OK_TTL_SECONDS = 300
 
-def validate_auth_token(token: str) -> bool:
-    """Validate auth token against the database."""
+def validate_auth_token(token: str) -> Optional[int]:
+    """Validate auth token against the database and return its ID."""
     try:
-        from auth_cli import check_token
-        return check_token(token)
+        from auth_cli import find_token_id
+        return find_token_id(token)
     except Exception:
-        # If there's any error importing or running check_token, deny access
-        return False
+        # If there's any error importing or running find_token_id, deny access
+        return None
+
 
+def rephrase_to_active_form(text: str, run_usage: Optional[usage_store.RunUsage] = None) -> str:
+    """Use GPT-4o to rephrase todo items to active form, counting its tokens against the run."""
+    cached = shared_state.cache_get("rephrase", text)
+    if cached is not None:
+        return cached
+    active_text = _rephrase_to_active_form(text, run_usage)
+    shared_state.cache_set("rephrase", text, active_text, ttl_seconds=REPHRASE_CACHE_TTL_SECONDS)
+    return active_text
 
-def rephrase_to_active_form(text: str) -> str:
-    """Use GPT-4o to rephrase todo items to active form."""
+def _rephrase_to_active_form(text: str, run_usage: Optional[usage_store.RunUsage] = None) -> str:
     try:
-        response = openai_client.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-4o",
             messages=[
                 {
@@ -80,6 +155,8 @@ def rephrase_to_active_form(text: str) -> str:
             max_tokens=50,
             temperature=0
         )
+        if run_usage is not None:
+            run_usage.add_openai("gpt-4o", response.usage)
         return response.choices[0].message.content.strip()
     except Exception:
         # Fallback: simple conversion
@@ -89,8 +166,9 @@ def rephrase_to_active_form(text: str) -> str:
 
 class TodoTracker:
     """Track todo items and detect status changes."""
-    def __init__(self):
+    def __init__(self, run_usage: Optional[usage_store.RunUsage] = None):
         self.previous_todos: Dict[str, str] = {}  # id -> status
+        self.run_usage = run_usage
         
     def process_todo_event(self, event: dict) -> Optional[str]:
         """Process TodoWrite events and return message if item became in_progress."""
@@ -113,7 +191,7 @@ class TodoTracker:
                             # New in_progress item detected
                             self.previous_todos[todo_id] = status
                             # Rephrase to active form
-                            active_text = rephrase_to_active_form(content_text)
+                            active_text = rephrase_to_active_form(content_text, self.run_usage)
                             return active_text
                     
                     # Update status tracking
@@ -122,6 +200,90 @@ class TodoTracker:
         
         return None
 
+class AssistantStream:
+    """Turn Claude stream-json events into coalesced assistant-text and tool marker events."""
+    # Buffered text is sent once it is this old or this long
+    FLUSH_INTERVAL_SECONDS = 0.15
+    FLUSH_CHARS = 400
+    
+    def __init__(self):
+        self.buffer: List[str] = []
+        self.buffered_chars = 0
+        self.last_flush = time.monotonic()
+        self.text_sent = False
+        self.separate_next = False
+        # Messages whose text already arrived as deltas
+        self.streamed_messages: set = set()
+        self.current_message: Optional[str] = None
+        self.tools: Dict[str, tuple] = {}  # tool_use id -> (name, start time)
+    
+    def process(self, event: dict) -> List[dict]:
+        """Return the SSE events (type and data) produced by one Claude event."""
+        event_type = event.get("type")
+        events = []
+        if event_type == "stream_event":
+            inner = event.get("event", {})
+            if inner.get("type") == "message_start":
+                self.current_message = inner.get("message", {}).get("id")
+                self.separate_next = True
+            elif inner.get("type") == "content_block_delta" and inner.get("delta", {}).get("type") == "text_delta":
+                self.streamed_messages.add(self.current_message)
+                self._append(inner["delta"].get("text", ""))
+        elif event_type == "assistant":
+            message = event.get("message", {})
+            streamed = message.get("id") is not None and message.get("id") in self.streamed_messages
+            self.separate_next = True
+            for block in message.get("content", []):
+                if block.get("type") == "text" and not streamed:
+                    self._append(block.get("text", ""))
+                elif block.get("type") == "tool_use" and block.get("name") != "TodoWrite":
+                    events.extend(self.flush())
+                    name = block.get("name", "").split("__")[-1]
+                    self.tools[block.get("id")] = (name, time.monotonic())
+                    events.append({"type": "tool-start", "data": {"id": block.get("id"), "name": name}})
+        elif event_type == "user":
+            for block in event.get("message", {}).get("content", []):
+                if not isinstance(block, dict) or block.get("type") != "tool_result":
+                    continue
+                tool = self.tools.pop(block.get("tool_use_id"), None)
+                if tool:
+                    events.extend(self.flush())
+                    events.append({"type": "tool-end", "data": {
+                        "id": block.get("tool_use_id"),
+                        "name": tool[0],
+                        "duration_ms": round((time.monotonic() - tool[1]) * 1000),
+                        "is_error": bool(block.get("is_error"))
+                    }})
+        if self.buffer and (self.buffered_chars >= self.FLUSH_CHARS or self.flush_delay() == 0):
+            events.extend(self.flush())
+        return events
+    
+    def flush_delay(self) -> Optional[float]:
+        """Seconds until buffered text is due to be sent, or None if nothing is buffered."""
+        if not self.buffer:
+            return None
+        return max(0.0, self.FLUSH_INTERVAL_SECONDS - (time.monotonic() - self.last_flush))
+    
+    def _append(self, text: str):
+        if not text:
+            return
+        if self.separate_next and (self.text_sent or self.buffer):
+            text = "\n\n" + text
+        self.separate_next = False
+        self.buffer.append(text)
+        self.buffered_chars += len(text)
+    
+    def flush(self) -> List[dict]:
+        """Send whatever text is buffered."""
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return []
+        text = "".join(self.buffer)
+        self.buffer = []
+        self.buffered_chars = 0
+        self.text_sent = True
+        return [{"type": "assistant-text", "data": text}]
+
 def format_json_recursively(obj):
     """Recursively check for JSON strings in text fields and parse them."""
     if isinstance(obj, dict):
@@ -147,7 +309,7 @@ def format_json_recursively(obj):
 def compress_response(claude_response: str) -> str:
     """Compress Claude's verbose response using OpenAI"""
     try:
-        response = openai_client.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
                 {
@@ -176,62 +338,364 @@ def compress_response(claude_response: str) -> str:
                 return f"Added workflow with ID: {workflow_id}\nWorkflow created successfully."
         return "Workflow processed successfully."
 
+class ChatRun:
+    """A single Claude run whose SSE events are fanned out to every attached client."""
+    def __init__(self):
+        self.events: List[str] = []
+        self.subscribers: List[asyncio.Queue] = []
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+    
+    async def produce(self, events):
+        """Drain the run's event generator, broadcasting each event."""
+        try:
+            async for event in events:
+                self.events.append(event)
+                for queue in self.subscribers:
+                    queue.put_nowait(event)
+        finally:
+            self.done = True
+            self.finished_at = time.monotonic()
+            for queue in self.subscribers:
+                queue.put_nowait(None)
+    
+    async def stream(self):
+        """Replay the events so far, then follow the run until it finishes."""
+        queue: asyncio.Queue = asyncio.Queue()
+        backlog = list(self.events)
+        if not self.done:
+            self.subscribers.append(queue)
+        try:
+            for event in backlog:
+                yield event
+            if queue not in self.subscribers:
+                return
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            if queue in self.subscribers:
+                self.subscribers.remove(queue)
+    
+    def expired(self, window_seconds: float) -> bool:
+        """Check whether a finished run is past its deduplication window."""
+        return self.done and time.monotonic() - self.finished_at > window_seconds
+
+# In-flight and recently finished runs by idempotency key
+chat_runs: Dict[str, ChatRun] = {}
+
+def attach_chat_run(request: "ChatRequest", generate_sse):
+    """Attach to the run for this request's idempotency key, starting it if needed."""
+    window = config.chat_dedup_window_seconds
+    for key in [key for key, run in chat_runs.items() if run.expired(window)]:
+        del chat_runs[key]
+    
+    # Scope keys to the caller and message so they cannot collide across users or turns
+    key = hashlib.sha256(
+        f"{request.auth_token}\0{request.idempotency_key}\0{request.message}".encode()
+    ).hexdigest()
+    run = chat_runs.get(key)
+    if run is None:
+        run = ChatRun()
+        chat_runs[key] = run
+        run.task = asyncio.create_task(run.produce(generate_sse()))
+    elif config.verbose_logging:
+        print(f"Attaching duplicate request to run {key[:12]}")
+    return run.stream()
+
+def build_prompt(message: str, credentials_context: str, page_context: str, request_uuid: str) -> str:
+    """Assemble the prompt from the most stable part to the most volatile one."""
+    parts = [PROMPT_PREAMBLE]
+    if credentials_context:
+        parts.append(credentials_context)
+    parts.append(message)
+    request_context = f"The UUID of this request with which you can call tools on the user's n8n is {request_uuid}"
+    if page_context:
+        request_context = f"{page_context}\n{request_context}"
+    parts.append(request_context)
+    return "\n\n".join(parts)
+
+async def route_message(message: str, workflow_id: Optional[str], in_session: bool,
+                        run_usage: usage_store.RunUsage) -> Route:
+    """Pick the tier for a message: local rules first, then the router model for new conversations."""
+    if not config.routing_enabled:
+        return Route(TIER_FULL, "disabled")
+    route = request_router.classify(message, workflow_id)
+    # The router model does not see earlier turns, so it only decides for new conversations
+    if route is None and config.router_model and not in_session:
+        route = await asyncio.to_thread(
+            request_router.classify_with_model, get_openai_client, config.router_model, message, workflow_id, run_usage
+        )
+    return route or Route(TIER_FULL, "rules:unsure")
+
+async def answer_directly(request: "ChatRequest", route: Route) -> Optional[str]:
+    """Answer a direct-tier message with one tool call; None means use Claude instead."""
+    try:
+        payload = await worker_mcp_client().call_n8n_tool(request.api_url, request.api_key, route.tool, route.arguments)
+    except Exception as e:
+        print(f"Error answering directly with {route.tool}: {e}")
+        return None
+    return request_router.format_direct_answer(route.tool, payload)
+
+def remember_direct_answer(session_id: str, question: str, answer: str) -> None:
+    """Keep a direct answer for the next Claude run of the session."""
+    answers = shared_state.cache_get("direct_answers", session_id) or []
+    answers = (answers + [{"question": question, "answer": answer[:DIRECT_CONTEXT_CHARS]}])[-DIRECT_CONTEXT_ANSWERS:]
+    shared_state.cache_set("direct_answers", session_id, answers, config.session_max_age_days * 24 * 3600)
+
+def take_direct_answers(session_id: str) -> str:
+    """Context describing direct answers given since the session's last Claude run."""
+    answers = shared_state.cache_get("direct_answers", session_id)
+    if not answers:
+        return ""
+    shared_state.cache_delete("direct_answers", session_id)
+    return "\n\n".join(
+        f"Earlier in this conversation the user asked \"{item['question']}\" and was shown:\n{item['answer']}"
+        for item in answers
+    )
+
+def remove_stale_credentials(max_age_seconds: float) -> int:
+    """Delete credential files of runs that never cleaned up after themselves."""
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    for path in cred_dir.glob("*.json"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+async def collect_stale_sessions():
+    """Periodically delete sessions and transcripts that have not been used for a while."""
+    while True:
+        try:
+            removed = await asyncio.to_thread(session_registry.garbage_collect, config.session_max_age_days)
+            await asyncio.to_thread(shared_state.cache_purge_expired)
+            await asyncio.to_thread(remove_stale_credentials, STALE_CREDENTIALS_SECONDS)
+            if removed and config.verbose_logging:
+                print(f"Removed {removed} stale sessions")
+        except Exception as e:
+            print(f"Error collecting stale sessions: {e}")
+        await asyncio.sleep(3600)
+
+@app.on_event("startup")
+async def startup():
+    # An unpriced model would not count against the token budgets
+    if config.router_model and usage_store.openai_price(config.router_model) is None:
+        raise RuntimeError(
+            f"ROUTER_MODEL {config.router_model} has no price in usage_store.OPENAI_PRICES_PER_MTOK; add it or use a listed model"
+        )
+    session_registry.init_db()
+    feedback_store.init_db()
+    usage_store.init_db()
+    feedback_writer.start()
+    asyncio.create_task(collect_stale_sessions())
+    drain.install_signal_hook()
+    # Started through main.py: now that this server can serve, retire the one it replaces
+    if os.getenv("SERVER_PID"):
+        previous_pid = await asyncio.to_thread(drain.take_over, f"{HOST}:{PORT}", int(os.environ["SERVER_PID"]))
+        if previous_pid:
+            print(f"Sent SIGTERM to previous server {previous_pid} so it drains")
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Runs cancelled at the drain deadline may not get to close their process trees
+    killed = kill_live_trees()
+    if killed:
+        print(f"Killed {killed} Claude run(s) still going at shutdown")
+    await feedback_writer.stop()
+    if prefetcher:
+        prefetcher.close()
+    if _worker_mcp_client is not None:
+        await _worker_mcp_client.disconnect()
+
 @app.post("/chat")
 async def chat(request: ChatRequest):
     """Stream Claude's response using Server-Sent Events."""
     async def generate_sse():
+        slot_id = None
+        tree = None
+        token_id = None
+        run_usage = usage_store.RunUsage(request_id=request.idempotency_key)
+        request_uuid = None
+        read_task = None
+        route = Route(TIER_FULL, "unrouted")
+        route_recorded = False
+        started_at = time.monotonic()
         try:
+            if drain.draining():
+                yield f"data: {json.dumps({'type': 'error', 'data': 'The server is restarting, please send your message again in a moment'})}\n\n"
+                return
+            
             # Validate auth token
             if not request.auth_token or not request.auth_token.strip():
                 yield f'data: {json.dumps({"type": "error", "data": "Authentication token is required"})}\n\n'
                 return
             
-            if not validate_auth_token(request.auth_token):
+            # Prefetch the workflow on the user's page while the token is checked; tokens
+            # not seen valid recently are checked first so they cannot trigger fetches
+            page_url = request.page_url or request.api_url
+            workflow_id = workflow_id_from_url(page_url)
+            token_key = hashlib.sha256(request.auth_token.encode()).hexdigest()
+            prefetch_task = None
+            if prefetcher and workflow_id and await asyncio.to_thread(shared_state.cache_get, "auth_ok", token_key):
+                prefetch_task = prefetcher.start(request.api_url, request.api_key, workflow_id)
+            
+            token_id = await asyncio.to_thread(validate_auth_token, request.auth_token)
+            if token_id is None:
+                if prefetch_task:
+                    prefetch_task.cancel()
                 yield f'data: {json.dumps({"type": "error", "data": "Invalid or expired authentication token"})}\n\n'
                 return
             
-            # Prepare prompt with context
-            prompt = request.message
-            if request.api_url:
-                if "/workflow/" in request.api_url:
-                    workflow_id = request.api_url.split("/workflow/")[-1].split("/")[0]
-                    prompt = f"I'm on n8n workflow page with ID: {workflow_id}\n\n{prompt}"
+            # Credentials catalogue from the full list, a delta or just its hash; tell the extension what to send next time
+            catalog, sync_status = await asyncio.to_thread(
+                credential_catalog.resolve, request.api_url, request.n8n_credentials,
+                request.credentials_hash, request.credentials_delta
+            )
+            if sync_status:
+                sync_data = {'hash': catalog.hash if catalog else None, 'status': sync_status}
+                yield f"data: {json.dumps({'type': 'credentials-sync', 'data': sync_data})}\n\n"
+            if sync_status == credential_catalog.SYNC_UNKNOWN:
+                # The stored catalogue is gone (expired or another server); the extension resends
+                # the request with the full list at once, so no run without credentials is started
+                # and nothing counts against the rate limit. The prefetch is kept for the resend.
+                return
+            
+            # Per-token budgets and rate limit, checked before any run is started
+            limit_error = await asyncio.to_thread(usage_store.check_limits, token_id, usage_store.TokenLimits(
+                daily_usd=config.token_daily_budget_usd,
+                monthly_usd=config.token_monthly_budget_usd,
+                requests_per_minute=config.token_requests_per_minute
+            ))
+            if limit_error:
+                if prefetch_task:
+                    prefetch_task.cancel()
+                yield f"data: {json.dumps({'type': 'error', 'data': limit_error})}\n\n"
+                return
+            await asyncio.to_thread(shared_state.cache_set, "auth_ok", token_key, True, AUTH_OK_TTL_SECONDS)
+            if prefetcher and workflow_id and prefetch_task is None:
+                prefetch_task = prefetcher.start(request.api_url, request.api_key, workflow_id)
+            
+            # Simple reads are answered with one tool call, without starting Claude
+            route = await route_message(request.message, workflow_id, bool(request.session_id), run_usage)
+            if config.verbose_logging:
+                print(f"Route: {route.tier} ({route.reason})")
+            if route.tier == TIER_DIRECT:
+                answer = await answer_directly(request, route)
+                if answer is not None:
+                    elapsed = time.monotonic() - started_at
+                    result_data = {
+                        'text': answer,
+                        'session_id': request.session_id,
+                        'usage': {'wallSeconds': round(elapsed, 2)},
+                        'tier': TIER_DIRECT
+                    }
+                    yield f"data: {json.dumps({'type': 'result', 'data': json.dumps(result_data)})}\n\n"
+                    await asyncio.to_thread(request_router.record_route, TIER_DIRECT, elapsed)
+                    route_recorded = True
+                    if request.session_id:
+                        await asyncio.to_thread(remember_direct_answer, request.session_id, request.message, answer)
+                    run_usage.session_id = request.session_id
+                    run_usage.wall_seconds = elapsed
+                    run_usage.tool_calls = 1
+                    try:
+                        await asyncio.to_thread(usage_store.record_run, token_id, run_usage)
+                    except Exception as e:
+                        print(f"Error recording usage: {e}")
+                    return
+                await asyncio.to_thread(shared_state.counter_add, "route.direct_fallbacks")
+                route = Route(TIER_FULL, "direct-fallback")
+            
+            # Admission control across all workers
+            slot_id = await asyncio.to_thread(shared_state.acquire_run_slot, config.max_concurrent_runs)
+            if slot_id is None:
+                yield f"data: {json.dumps({'type': 'progress-update', 'data': 'Waiting for a free slot...'})}\n\n"
+                deadline = time.monotonic() + config.admission_timeout_seconds
+                while slot_id is None and time.monotonic() < deadline:
+                    await asyncio.sleep(0.5)
+                    slot_id = await asyncio.to_thread(shared_state.acquire_run_slot, config.max_concurrent_runs)
+                if slot_id is None:
+                    yield f"data: {json.dumps({'type': 'error', 'data': 'The service is busy, please try again in a moment'})}\n\n"
+                    return
+            
+            # Page context for this request
+            page_context = ""
+            if page_url:
+                if workflow_id:
+                    page_context = f"I'm on n8n workflow page with ID: {workflow_id}"
                 else:
-                    prompt = f"I'm on n8n page: {request.api_url}\n\n{prompt}"
+                    page_context = f"I'm on n8n page: {page_url}"
             
             # Store credentials temporarily
             request_uuid = str(uuid.uuid4())
-            credential = N8NCredential(api_key=request.api_key, api_url=request.api_url)
+            credential = N8NCredential(
+                api_key=request.api_key,
+                api_url=request.api_url,
+                credentials_catalog=credential_catalog.catalog_key(request.api_url, catalog.hash) if catalog else None
+            )
             credential.write(cred_dir / f"{request_uuid}.json")
             
-            # Add credentials context if available
+            # Resume the session unless it has grown too large, in which case start a fresh one
+            resume_id, rollover_context = None, None
+            if request.session_id:
+                resume_id, rollover_context = await asyncio.to_thread(
+                    session_registry.resolve_resume, request.session_id, config.session_rollover_bytes
+                )
+                if config.verbose_logging:
+                    print(f"Session {request.session_id}: rollover {rollover_context is not None}")
+            
+            # Only send the credentials list when the session has not seen this version of it
             credentials_context = ""
-            if request.n8n_credentials:
-                credentials_data = request.n8n_credentials.get('rawResponse', {}).get('data', [])
-                if credentials_data:
-                    cred_list = []
-                    for cred in credentials_data:
-                        cred_info = f"- {cred.get('name', 'Unknown')} (ID: {cred.get('id', 'unknown')}, Type: {cred.get('type', 'unknown')})"
-                        cred_list.append(cred_info)
-                    credentials_context = f"\n\nAvailable n8n credentials you can reference by ID:\n" + "\n".join(cred_list)
+            creds_hash = catalog.hash if catalog and catalog.credentials else None
+            if creds_hash:
+                seen_hash = await asyncio.to_thread(shared_state.cache_get, "session_credentials", resume_id) if resume_id else None
+                if seen_hash == creds_hash:
+                    credentials_context = "The available n8n credentials are unchanged since earlier in this conversation. Use the lookup_n8n_credentials tool if you need them again."
+                else:
+                    credentials_context = catalog.context()
             
-            system_prompt = """You are an n8n workflow creation and management expert. You have access to tools to create, update, and manage n8n workflows via API."""
-            prompt = f"{system_prompt}\n\nThe UUID of this request with which you can call tools on the user's n8n is {request_uuid}{credentials_context}\n\n{prompt}"
+            message = request.message
+            if rollover_context:
+                message = f"{rollover_context}\n\n{message}"
+            if request.session_id:
+                direct_context = await asyncio.to_thread(take_direct_answers, request.session_id)
+                if direct_context:
+                    message = f"{direct_context}\n\n{message}"
+            prompt = build_prompt(message, credentials_context, page_context, request_uuid)
+            if config.verbose_logging:
+                print(f"Prompt: {len(prompt)} chars, credentials context: {len(credentials_context)} chars")
             
             # Build Claude command with streaming JSON output
             claude_cmd = ["claude", "-p", prompt, "--output-format", "stream-json", "--verbose"]
-            if request.session_id:
-                claude_cmd.extend(["--resume", request.session_id])
+            if resume_id:
+                claude_cmd.extend(["--resume", resume_id])
+            if request.stream_text:
+                claude_cmd.append("--include-partial-messages")
+            if route.tier == TIER_LIGHT:
+                claude_cmd.extend(request_router.light_tier_args(config.light_model))
             
-            # Start subprocess
+            # Start subprocess in its own session so the whole tree can be sampled and killed
             process = await asyncio.create_subprocess_exec(
                 *claude_cmd,
                 stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True
             )
+            tree = ProcessTree(process, TreeLimits(
+                max_rss_bytes=config.run_max_rss_mb * 2**20,
+                max_cpu_seconds=config.run_max_cpu_seconds,
+                max_wall_seconds=config.run_max_wall_seconds
+            ), config.run_cgroup_root).start()
             
             # Initialize todo tracker and stream collection
-            todo_tracker = TodoTracker()
+            todo_tracker = TodoTracker(run_usage)
+            assistant_stream = AssistantStream() if request.stream_text else None
             stream_events = [] if config.enable_stream_logging else None
             
             # Create timestamp for logging (only in development)
@@ -241,7 +705,17 @@ async def chat(request: ChatRequest):
             
             # Stream stdout line by line
             while True:
-                line = await process.stdout.readline()
+                if read_task is None:
+                    read_task = asyncio.ensure_future(process.stdout.readline())
+                # Buffered text is sent on time even when the next event is a long tool call away
+                flush_delay = assistant_stream.flush_delay() if assistant_stream else None
+                done, _ = await asyncio.wait({read_task}, timeout=flush_delay)
+                if not done:
+                    for update in assistant_stream.flush():
+                        yield f"data: {json.dumps(update)}\n\n"
+                    continue
+                line = read_task.result()
+                read_task = None
                 if not line:
                     break
                 
@@ -250,14 +724,22 @@ async def chat(request: ChatRequest):
                     event = json.loads(line.decode().strip())
                     event_type = event.get("type")
                     
-                    # Add to stream collection (only in development)
-                    if config.enable_stream_logging:
+                    run_usage.add_event(event)
+                    
+                    # Add to stream collection (only in development); partial message deltas are too noisy
+                    if config.enable_stream_logging and event_type != "stream_event":
                         stream_events.append(event)
                     
+                    # Forward assistant text and tool markers as they arrive
+                    if assistant_stream:
+                        stream_updates = assistant_stream.flush() if event_type == "result" else assistant_stream.process(event)
+                        for update in stream_updates:
+                            yield f"data: {json.dumps(update)}\n\n"
+                    
                     # Check for TodoWrite events
                     if event_type == "assistant":
                         # Process todo events
-                        todo_message = todo_tracker.process_todo_event(event)
+                        todo_message = await asyncio.to_thread(todo_tracker.process_todo_event, event)
                         if todo_message:
                             # Send todo update as progress update
                             yield f"data: {json.dumps({'type': 'progress-update', 'data': todo_message})}\n\n"
@@ -266,11 +748,34 @@ async def chat(request: ChatRequest):
                     
                     elif event_type == "result":
                         # Send final result with session_id in data
+                        usage = await asyncio.to_thread(tree.sample)
                         result_data = {
                             'text': event.get('result', ''),
-                            'session_id': event.get('session_id')
+                            'session_id': event.get('session_id'),
+                            'usage': usage.to_dict(),
+                            'tier': route.tier
                         }
                         yield f"data: {json.dumps({'type': 'result', 'data': json.dumps(result_data)})}\n\n"
+                        if not route_recorded:
+                            await asyncio.to_thread(request_router.record_route, route.tier, time.monotonic() - started_at)
+                            route_recorded = True
+                        
+                        if creds_hash and event.get('session_id'):
+                            await asyncio.to_thread(
+                                shared_state.cache_set, "session_credentials", event['session_id'], creds_hash,
+                                config.session_max_age_days * 24 * 3600
+                            )
+                        if event.get('session_id'):
+                            try:
+                                await asyncio.to_thread(
+                                    session_registry.record_turn,
+                                    event['session_id'],
+                                    request.session_id,
+                                    event.get('result') or '',
+                                    rollover_context is not None
+                                )
+                            except Exception as e:
+                                print(f"Error recording session turn: {e}")
                 
                 except json.JSONDecodeError:
                     # Add raw line to stream for non-JSON content (only in development)
@@ -280,6 +785,10 @@ async def chat(request: ChatRequest):
             
             # Wait for process to complete
             await process.wait()
+            if tree.violation:
+                yield f"data: {json.dumps({'type': 'error', 'data': tree.violation})}\n\n"
+            if config.verbose_logging:
+                print(f"Run usage: {tree.usage.to_dict()}")
             
             # Save stream to file with proper formatting (only in development)
             if config.enable_stream_logging and stream_events:
@@ -291,17 +800,33 @@ async def chat(request: ChatRequest):
                     if config.is_development:
                         print(f"Error saving stream log: {e}")
             
-            # Clean up credentials
-            if os.path.exists(cred_dir / f"{request_uuid}.json"):
-                os.remove(cred_dir / f"{request_uuid}.json")
-            
             # Stream ends naturally, no explicit done event needed
             
         except Exception as e:
             yield f"data: {json.dumps({'type': 'error', 'data': str(e)})}\n\n"
+        finally:
+            if read_task is not None:
+                read_task.cancel()
+            # Clean up credentials, also when the run is cancelled (client gone, drain deadline)
+            if request_uuid and os.path.exists(cred_dir / f"{request_uuid}.json"):
+                os.remove(cred_dir / f"{request_uuid}.json")
+            if tree is not None:
+                await tree.close()
+                run_usage.wall_seconds = tree.usage.wall_seconds
+                try:
+                    await asyncio.to_thread(usage_store.record_run, token_id, run_usage)
+                except Exception as e:
+                    print(f"Error recording usage: {e}")
+            if slot_id is not None:
+                await asyncio.to_thread(shared_state.release_run_slot, slot_id)
+    
+    if request.idempotency_key:
+        stream = attach_chat_run(request, generate_sse)
+    else:
+        stream = generate_sse()
     
     return StreamingResponse(
-        generate_sse(),
+        stream,
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -312,31 +837,65 @@ async def chat(request: ChatRequest):
 
 @app.post("/feedback")
 async def submit_feedback(request: FeedbackRequest):
-    """Submit user feedback to CSV file."""
-    feedback_file = base_dir / "feedback.csv"
-    
-    # Create CSV with headers if it doesn't exist
-    file_exists = feedback_file.exists()
-    
-    with open(feedback_file, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        
-        # Write headers if new file
-        if not file_exists:
-            writer.writerow(['timestamp', 'feedback'])
-        
-        # Write feedback with timestamp
-        writer.writerow([
-            datetime.now().isoformat(),
-            request.feedback
-        ])
-    
+    """Queue user feedback for the background writer."""
+    feedback_writer.submit(request.feedback, request.session_id, request.request_id)
     return {"status": "success", "message": "Thank you for your feedback!"}
 
+@app.get("/feedback/export")
+async def export_feedback(x_admin_token: Optional[str] = Header(None)):
+    """Stream all feedback as CSV."""
+    if not config.admin_token or x_admin_token != config.admin_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return StreamingResponse(
+        feedback_store.export_csv(),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=feedback.csv"}
+    )
+
+@app.get("/metrics")
+async def metrics(x_admin_token: Optional[str] = Header(None)):
+    """Resource usage totals of this worker's Claude runs."""
+    if not config.admin_token or x_admin_token != config.admin_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {
+        "worker": session_registry.WORKER_ID,
+        "runs": process_metrics,
+        "prefetch": await asyncio.to_thread(prefetch_stats),
+        "routing": await asyncio.to_thread(request_router.routing_stats),
+        "sessions": await asyncio.to_thread(session_registry.affinity_stats)
+    }
+
+@app.post("/admin/drain")
+async def start_drain(x_admin_token: Optional[str] = Header(None)):
+    """Drain the whole server: refuse new chats, finish running ones, then exit."""
+    if not config.admin_token or x_admin_token != config.admin_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    drain.start_draining("admin request")
+    # Signal the uvicorn parent so every worker drains, not just this one
+    os.kill(int(os.getenv("SERVER_PID", os.getpid())), signal.SIGTERM)
+    return {"status": "draining", "timeoutSeconds": config.drain_timeout_seconds}
+
 @app.get("/health")
 async def health():
+    if drain.draining():
+        return JSONResponse({"status": "draining"}, status_code=503)
     return {"status": "ok"}
 
 if __name__ == "__main__":
+    import sys
+    if "--profile-startup" in sys.argv:
+        from startup_profile import profile_main_startup
+        profile_main_startup()
+        sys.exit(0)
+    
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    # Workers inherit the listening socket and learn which process to signal for a drain
+    os.environ["SERVER_PID"] = str(os.getpid())
+    sock = drain.listening_socket(HOST, PORT)
+    # On SIGTERM, running chats get this long to finish before they are cancelled
+    graceful = config.drain_timeout_seconds or None
+    if config.workers > 1:
+        # Workers share admission slots and caches through shared_state
+        uvicorn.run("main:app", fd=sock.fileno(), workers=config.workers, timeout_graceful_shutdown=graceful)
+    else:
+        uvicorn.run(app, fd=sock.fileno(), timeout_graceful_shutdown=graceful)
\ No newline at end of file
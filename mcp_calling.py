@@ -7,33 +7,129 @@ import asyncio
 import json
 import os
 import sys
+import time
 from pathlib import Path
 import uuid
-from n8n_credential import N8NCredential
+from config import config
+from workflow_cache import (
+    CACHEABLE_READ_TOOLS, PREFETCH_EXECUTIONS_LIMIT, SNAPSHOT_SOURCE_TOOLS, WORKFLOW_WRITE_TOOLS,
+    WorkflowCache, WorkflowSnapshot, mark_prefetched, record_prefetch_hit,
+    store_prefetched_executions, take_prefetched_executions, workflow_view
+)
+from workflow_diff import diff_workflow
+from validation_cache import VALIDATION_TOOLS, ValidationCache
+from result_shaping import FULL_RESULT_TOOL_NAME, ResultShaper
+import credential_catalog
+from call_policy import (
+    SIDE_EFFECT_TOOLS, CallPolicies, CallPolicy, CircuitBreakers, LatencyTracker,
+    backend_restarted_error, circuit_open_error, is_transient_error, retry_delay, timeout_error
+)
+from process_tree import process_rss_bytes
+import proxy_log as log
 
-import mcp.types as types
+import tool_content as types
 from dotenv import load_dotenv
 load_dotenv()
 
+# Maximum size of a single JSON-RPC line read from the backend
+STREAM_LIMIT_BYTES = 64 * 1024 * 1024
+
+# Backend supervision: health-check timing and restart backoff
+BACKEND_PING_TIMEOUT_SECONDS = 5.0
+BACKEND_RESTART_BASE_DELAY_SECONDS = 0.5
+BACKEND_RESTART_MAX_DELAY_SECONDS = 30.0
+# A backend that ran this long before dying resets the restart backoff
+BACKEND_STABLE_SECONDS = 60.0
+# Sends of one idempotent request across backend restarts
+BACKEND_RESEND_ATTEMPTS = 2
+
+# Proxy-level tool that fans several tool calls out to the backend at once
+BATCH_TOOL_NAME = "batch_tool_calls"
+MAX_BATCH_CALLS = 20
+DEFAULT_BATCH_CONCURRENCY = 4
+MAX_BATCH_CONCURRENCY = 8
+
+# Proxy-level tool that looks up the user's n8n credentials by type or name
+CREDENTIALS_TOOL_NAME = "lookup_n8n_credentials"
+
+# Read-only tools that may run concurrently inside a batch; anything else, including
+# tools added to n8n-mcp later, must be called directly
+BATCH_ALLOWED_TOOLS = VALIDATION_TOOLS | {
+    'tools_documentation', 'list_nodes', 'get_node_info', 'search_nodes', 'list_ai_tools',
+    'get_node_documentation', 'get_database_statistics', 'get_node_essentials',
+    'search_node_properties', 'get_node_for_task', 'list_tasks', 'get_property_dependencies',
+    'get_node_as_tool_info', 'list_node_templates', 'get_template', 'search_templates',
+    'get_templates_for_task', 'n8n_get_workflow', 'n8n_get_workflow_details',
+    'n8n_get_workflow_structure', 'n8n_get_workflow_minimal', 'n8n_list_workflows',
+    'n8n_validate_workflow', 'n8n_get_execution', 'n8n_list_executions', 'n8n_health_check',
+    'n8n_list_available_tools', 'n8n_diagnostic'
+} - SIDE_EFFECT_TOOLS
+
+
+class BackendUnavailableError(Exception):
+    """The n8n-mcp process exited or its stdio pipes closed."""
+
 
 class DirectMCPClient:
     cred_dir = Path(__file__).parent / "creds"
     """Direct client to test the original n8n-mcp server."""
+
+    # Original server configuration (same as proxy)
+    index_path = Path(__file__).parent / "n8n-mcp" / "dist" / "mcp" / "index.js"
+    # index_path = "/Users/ignacekonig/projects/n8n-mcp/dist/mcp/index.js"
+
+    # tools/list result of the backend, reused while index.js is unchanged
+    tool_cache_path = Path(__file__).parent / ".cache" / "tools.json"
+
+    n8n_management_tools = {
+        'n8n_create_workflow', 'n8n_get_workflow', 'n8n_get_workflow_details',
+        'n8n_get_workflow_structure', 'n8n_get_workflow_minimal', 'n8n_update_full_workflow',
+        'n8n_update_partial_workflow', 'n8n_delete_workflow', 'n8n_list_workflows',
+        'n8n_validate_workflow', 'n8n_trigger_webhook_workflow', 'n8n_get_execution',
+        'n8n_list_executions', 'n8n_delete_execution', 'n8n_health_check',
+        'n8n_list_available_tools', 'n8n_diagnostic'
+    }
     
     def __init__(self):
         self.process = None
         self.reader = None
         self.writer = None
         self.request_id = 0
+        self._pending: dict[int, asyncio.Future] = {}
+        self._reader_task = None
+        self._connect_task = None
+        self.workflow_cache = WorkflowCache(fresh_seconds=config.workflow_cache_fresh_seconds)
+        self.diffed_updates = 0
+        self.diff_fallbacks = 0
+        self.validation_cache = ValidationCache()
+        self.server_version = "unknown"
+        self.result_shaper = ResultShaper(byte_budget=config.result_byte_budget)
+        self.call_policies = CallPolicies(self.n8n_management_tools, config.tool_policies)
+        self.circuit_breakers = CircuitBreakers(config.circuit_failure_threshold, config.circuit_reset_seconds)
+        self.latency = LatencyTracker()
+        self.timeouts = 0
+        self.retries = 0
+        self.hedges = 0
+        self._supervisor_task = None
+        self._restart_lock = asyncio.Lock()
+        self.backend_generation = 0
+        self.backend_restarts = 0
+        self._backend_started_at = 0.0
+        self._crash_streak = 0
+        self._calls_since_spawn = 0
+        # Set when the backend should be replaced as soon as it is idle
+        self._recycle_reason: str | None = None
     
     async def connect(self) -> "DirectMCPClient":
-        """Connect to the original n8n-mcp server."""
-        print("🔌 Connecting to original n8n-mcp server...", file=sys.stderr)
-        
-        # Original server configuration (same as proxy)
-        index_path = Path(__file__).parent / "n8n-mcp" / "dist" / "mcp" / "index.js"
-        # index_path = "/Users/ignacekonig/projects/n8n-mcp/dist/mcp/index.js"
-        cmd = ["node", str(index_path)]
+        """Connect to the original n8n-mcp server and start supervising it."""
+        started = time.monotonic()
+        await self._spawn_backend()
+        log.info("backend.connected", server=self.server_version, ms=log.elapsed_ms(started))
+        return self
+
+    async def _spawn_backend(self) -> None:
+        """Start the node process and run the initialize handshake."""
+        cmd = ["node", str(self.index_path)]
         env = os.environ.copy()
         env.update({
             "MCP_MODE": "stdio",
@@ -41,42 +137,165 @@ class DirectMCPClient:
             "DISABLE_CONSOLE_OUTPUT": "true"
         })
 
-        self.n8n_management_tools = {
-            'n8n_create_workflow', 'n8n_get_workflow', 'n8n_get_workflow_details',
-            'n8n_get_workflow_structure', 'n8n_get_workflow_minimal', 'n8n_update_full_workflow',
-            'n8n_update_partial_workflow', 'n8n_delete_workflow', 'n8n_list_workflows',
-            'n8n_validate_workflow', 'n8n_trigger_webhook_workflow', 'n8n_get_execution',
-            'n8n_list_executions', 'n8n_delete_execution', 'n8n_health_check',
-            'n8n_list_available_tools', 'n8n_diagnostic'
-        }
-
-        print(f"🚀 Starting command: {' '.join(cmd)}", file=sys.stderr)
+        log.debug("backend.spawn", command=cmd)
         
         self.process = await asyncio.create_subprocess_exec(
             *cmd,
             stdin=asyncio.subprocess.PIPE,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
-            env=env
+            env=env,
+            # Workflow and execution responses arrive as a single, possibly very long, line
+            limit=STREAM_LIMIT_BYTES
         )
         
         self.reader = self.process.stdout
         self.writer = self.process.stdin
+        self._reader_task = asyncio.create_task(self._read_loop())
+        self.backend_generation += 1
+        self._backend_started_at = time.monotonic()
+        self._calls_since_spawn = 0
+        self._recycle_reason = None
         
         # Initialize the connection
         await self._initialize()
-        print("✅ Connected and initialized!", file=sys.stderr)
-        return self
-    
-    async def disconnect(self) -> None:
-        """Disconnect from the original n8n-mcp server."""
+        if self._supervisor_task is None:
+            self._supervisor_task = asyncio.create_task(self._supervise())
+
+    async def _stop_backend(self) -> None:
+        """Stop the node process; requests still waiting on it fail with BackendUnavailableError."""
         if self.writer:
             self.writer.close()
-            await self.writer.wait_closed()
-        if self.process:
+        if self._reader_task:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self.process and self.process.returncode is None:
             self.process.terminate()
-            await self.process.wait()
-        print("🔌 Disconnected from original n8n-mcp server", file=sys.stderr)
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+
+    def _backend_alive(self) -> bool:
+        return (
+            self.process is not None and self.process.returncode is None
+            and self._reader_task is not None and not self._reader_task.done()
+        )
+
+    async def _restart_backend(self, reason: str, generation: int | None = None) -> None:
+        """Replace the backend process, backing off when it keeps dying.
+
+        With a generation, only that backend is replaced (it may already have
+        been by a concurrent caller); without one, only a dead backend is.
+        """
+        async with self._restart_lock:
+            if generation is not None and generation != self.backend_generation:
+                return
+            if generation is None and self._backend_alive():
+                return
+            # Replacing a dead backend (no generation) counts as a crash
+            if generation is None and time.monotonic() - self._backend_started_at < BACKEND_STABLE_SECONDS:
+                self._crash_streak += 1
+            else:
+                self._crash_streak = 0
+            # The first crash is restarted at once; repeated ones back off
+            delay = 0.0
+            if self._crash_streak > 1:
+                delay = min(BACKEND_RESTART_MAX_DELAY_SECONDS, BACKEND_RESTART_BASE_DELAY_SECONDS * 2 ** (self._crash_streak - 2))
+            log.warning("backend.restart", reason=reason, delaySeconds=delay, restarts=self.backend_restarts + 1)
+            self.backend_restarts += 1
+            await self._stop_backend()
+            if delay:
+                await asyncio.sleep(delay)
+            await self._spawn_backend()
+
+    async def _ensure_backend(self) -> None:
+        """Wait for the connection, replacing a dead backend or recycling an idle one first."""
+        await self._ensure_connected()
+        if self._recycle_reason and not self._pending:
+            await self._restart_backend(self._recycle_reason, self.backend_generation)
+        elif not self._backend_alive():
+            await self._restart_backend("backend exited")
+
+    async def _ping(self) -> bool:
+        """Check that the backend still answers requests."""
+        request = {"jsonrpc": "2.0", "id": self._get_next_id(), "method": "ping"}
+        try:
+            async with asyncio.timeout(BACKEND_PING_TIMEOUT_SECONDS):
+                await self._send_request(request)
+                # Any response, even an error for an unknown method, means it is alive
+                await self._read_response(request["id"])
+            return True
+        except (TimeoutError, BackendUnavailableError):
+            return False
+
+    async def _supervise(self) -> None:
+        """Periodically health-check the backend and replace it when needed."""
+        max_rss_bytes = config.backend_max_rss_mb * 2**20
+        while True:
+            await asyncio.sleep(config.backend_health_interval_seconds)
+            generation = self.backend_generation
+            try:
+                if not self._backend_alive():
+                    await self._restart_backend("backend exited")
+                    continue
+                if max_rss_bytes and not self._recycle_reason:
+                    rss_bytes = process_rss_bytes(self.process.pid)
+                    if rss_bytes > max_rss_bytes:
+                        self._recycle_reason = f"RSS {rss_bytes // 2**20} MB over the {config.backend_max_rss_mb} MB limit"
+                if self._recycle_reason and not self._pending:
+                    await self._restart_backend(self._recycle_reason, generation)
+                elif not await self._ping():
+                    await self._restart_backend("ping timed out", generation)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error("backend.supervise_failed", error=str(e))
+    
+    def start(self) -> "DirectMCPClient":
+        """Connect to the original n8n-mcp server in the background.
+
+        Calls that need the backend wait for the connection; everything else
+        (including a cached tools/list) is served immediately.
+        """
+        self._connect_task = asyncio.create_task(self.connect())
+        self._connect_task.add_done_callback(_log_connect_failure)
+        return self
+
+    async def _ensure_connected(self) -> None:
+        """Wait for a background connection started by start()."""
+        if self._connect_task is not None:
+            try:
+                await self._connect_task
+            except Exception:
+                # Later calls retry through _restart_backend
+                self._connect_task = None
+                raise
+
+    async def disconnect(self) -> None:
+        """Disconnect from the original n8n-mcp server."""
+        if self._connect_task is not None and not self._connect_task.done():
+            self._connect_task.cancel()
+        if self._supervisor_task is not None:
+            self._supervisor_task.cancel()
+        await self._stop_backend()
+        log.info(
+            "backend.disconnected",
+            resultBytesIn=self.result_shaper.bytes_in,
+            resultBytesOut=self.result_shaper.bytes_out,
+            workflowCacheHits=self.workflow_cache.hits,
+            workflowCacheMisses=self.workflow_cache.misses,
+            validationCacheHits=self.validation_cache.hits,
+            validationCacheMisses=self.validation_cache.misses,
+            timeouts=self.timeouts,
+            retries=self.retries,
+            hedges=self.hedges,
+            backendRestarts=self.backend_restarts
+        )
     
     def _get_next_id(self) -> int:
         """Get next request ID."""
@@ -85,25 +304,67 @@ class DirectMCPClient:
     
     async def _send_request(self, request: dict) -> None:
         """Send a request to the original server."""
-        message = json.dumps(request) + "\n"
-        self.writer.write(message.encode())
-        await self.writer.drain()
-        print(f"📤 SENT: {json.dumps(request, indent=2)}", file=sys.stderr)
+        if self._reader_task is None or self._reader_task.done():
+            raise BackendUnavailableError("No response received from server")
+        if "id" in request:
+            # Register before writing so a fast response cannot be missed
+            self._pending[request["id"]] = asyncio.get_running_loop().create_future()
+        message = (json.dumps(request) + "\n").encode()
+        try:
+            self.writer.write(message)
+            await self.writer.drain()
+        except (ConnectionError, RuntimeError) as e:
+            self._pending.pop(request.get("id"), None)
+            raise BackendUnavailableError(f"No response received from server: {e}") from e
+        log.debug("rpc.sent", id=request.get("id"), method=request.get("method"), bytes=len(message))
     
-    async def _read_response(self) -> dict:
-        """Read a response from the original server."""
-        line = await self.reader.readline()
-        if not line:
-            raise Exception("No response received from server")
-        
-        response = json.loads(line.decode().strip())
-        print(f"📥 RECEIVED: {json.dumps(response, indent=2)}", file=sys.stderr)
-        return response
+    async def _read_response(self, request_id: int) -> dict:
+        """Wait for the response to a request sent to the original server."""
+        try:
+            return await self._pending[request_id]
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _request(self, request: dict, idempotent: bool = True) -> dict:
+        """Send a request and wait for its response, resending idempotent ones if the backend restarts."""
+        for attempt in range(1, BACKEND_RESEND_ATTEMPTS + 1):
+            await self._ensure_backend()
+            started = time.monotonic()
+            try:
+                await self._send_request(request)
+                response = await self._read_response(request["id"])
+            except BackendUnavailableError:
+                if not idempotent or attempt == BACKEND_RESEND_ATTEMPTS:
+                    raise
+                log.warning("rpc.resend", id=request["id"], method=request.get("method"))
+                continue
+            log.debug("rpc.completed", id=request["id"], method=request.get("method"), ms=log.elapsed_ms(started))
+            return response
+
+    async def _read_loop(self) -> None:
+        """Read responses from the original server and route them to waiting requests by ID."""
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                try:
+                    response = json.loads(line.decode().strip())
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(response, dict):
+                    continue
+                log.debug("rpc.received", id=response.get("id"), bytes=len(line))
+                future = self._pending.get(response.get("id"))
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(BackendUnavailableError("No response received from server"))
     
     async def _initialize(self) -> None:
         """Send initialization sequence."""
-        print("🔄 Sending initialize request...", file=sys.stderr)
-        
         # Send initialize request
         init_request = {
             "jsonrpc": "2.0",
@@ -122,13 +383,16 @@ class DirectMCPClient:
         }
         
         await self._send_request(init_request)
-        init_response = await self._read_response()
+        init_response = await self._read_response(init_request["id"])
         
         if "error" in init_response:
             raise Exception(f"Initialize failed: {init_response['error']}")
+
+        # Validation results are only reusable against the same backend version
+        server_info = init_response.get("result", {}).get("serverInfo", {})
+        self.server_version = f"{server_info.get('name', 'unknown')}@{server_info.get('version', 'unknown')}"
         
         # Send initialized notification
-        print("🔄 Sending initialized notification...", file=sys.stderr)
         initialized_notification = {
             "jsonrpc": "2.0",
             "method": "notifications/initialized"
@@ -137,31 +401,11 @@ class DirectMCPClient:
     
     async def list_tools(self) -> list[types.Tool]:
         """Test tools/list request."""
-        print("📋 Testing tools/list...", file=sys.stderr)
-        
-        request = {
-            "jsonrpc": "2.0",
-            "id": self._get_next_id(),
-            "method": "tools/list"
-        }
-        
-        await self._send_request(request)
-        response = await self._read_response()
-        
-        if "error" in response:
-            print(f"❌ ERROR in tools/list: {response['error']}", file=sys.stderr)
-            return []
-        
-        tools_data = response.get("result", {}).get("tools", [])
-        print(f"✅ SUCCESS: Found {len(tools_data)} tools", file=sys.stderr)
-        
-        # Print first few tool names
-        if tools_data:
-            print("🔧 Available tools:", file=sys.stderr)
-            for i, tool in enumerate(tools_data[:5]):
-                print(f"   {i+1}. {tool['name']}", file=sys.stderr)
-            if len(tools_data) > 5:
-                print(f"   ... and {len(tools_data) - 5} more", file=sys.stderr)
+        tools_data = self._load_tool_cache()
+        if tools_data is None:
+            tools_data = await self._fetch_tools()
+            if tools_data:
+                self._save_tool_cache(tools_data)
         
         # Convert to MCP Tool objects
         tools = []
@@ -172,23 +416,88 @@ class DirectMCPClient:
                 description=tool_data.get("description", ""),
                 inputSchema=tool_data.get("inputSchema", {})
             ))
+        tools.append(self._batch_tool())
+        tools.append(self.result_shaper.tool())
+        tools.append(self._credentials_tool())
         
         return tools
     
+    async def _fetch_tools(self) -> list[dict]:
+        """Request the tool list from the original server."""
+        request = {
+            "jsonrpc": "2.0",
+            "id": self._get_next_id(),
+            "method": "tools/list"
+        }
+        
+        response = await self._request(request)
+        
+        if "error" in response:
+            log.error("tools.list_failed", error=response['error'])
+            return []
+        
+        tools_data = response.get("result", {}).get("tools", [])
+        log.info("tools.listed", count=len(tools_data))
+        return tools_data
+
+    def _tool_cache_key(self) -> str | None:
+        """Identify the backend build the tool cache belongs to."""
+        try:
+            stat = self.index_path.stat()
+        except OSError:
+            return None
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def _load_tool_cache(self) -> list[dict] | None:
+        """Load the cached tool list if it matches the current backend build."""
+        key = self._tool_cache_key()
+        try:
+            cached = json.loads(self.tool_cache_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return None
+        if key is None or cached.get("key") != key:
+            return None
+        return cached.get("tools")
+
+    def _save_tool_cache(self, tools_data: list[dict]) -> None:
+        """Write the tool list cache for the next proxy start."""
+        key = self._tool_cache_key()
+        if key is None:
+            return
+        try:
+            self.tool_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.tool_cache_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps({"key": key, "tools": tools_data}))
+            tmp_path.replace(self.tool_cache_path)
+        except OSError as e:
+            log.error("tools.cache_write_failed", error=str(e))
+
     async def call_tool(self, tool_name: str, arguments: dict | None = None) -> list[types.TextContent]:
         """Test tools/call request."""
         if arguments is None:
             arguments = {}
 
+        if tool_name == BATCH_TOOL_NAME:
+            return await self._batch_tool_calls(arguments)
+        if tool_name == FULL_RESULT_TOOL_NAME:
+            return self.result_shaper.full_result(arguments)
+        if tool_name == CREDENTIALS_TOOL_NAME:
+            return await asyncio.to_thread(self._lookup_credentials, arguments)
+
+        content = await self._call_tool(tool_name, arguments)
+        return self.result_shaper.shape(tool_name, content)
+
+    async def _call_tool(self, tool_name: str, arguments: dict) -> list[types.TextContent]:
+        """Resolve credentials and serve a tool call from the caches or the backend."""
         if tool_name in self.n8n_management_tools and "apiUuid" in arguments:
             # Look up credentials by UUID
             api_uuid = arguments.pop("apiUuid")
 
             if os.path.exists(self.cred_dir / f"{api_uuid}.json"):
-                credentials = N8NCredential.read(self.cred_dir / f"{api_uuid}.json")
+                credentials = _read_credential(self.cred_dir / f"{api_uuid}.json")
             
             else:
-                print(f"❌ ERROR: No credentials found for UUID {api_uuid}", file=sys.stderr)
+                log.warning("credentials.not_found", tool=tool_name, apiUuid=api_uuid)
                 return [types.TextContent(
                     type="text",
                     text=json.dumps({
@@ -201,7 +510,114 @@ class DirectMCPClient:
             arguments["apiUrl"] = credentials.api_url
             arguments["apiKey"] = credentials.api_key
         
-        print(f"🔧 Testing tools/call for '{tool_name}' with args: {arguments}", file=sys.stderr)
+        api_url = arguments.get("apiUrl")
+        if api_url and tool_name in WORKFLOW_WRITE_TOOLS:
+            diffed = None
+            if tool_name == "n8n_update_full_workflow" and arguments.get("id"):
+                diffed = await self._diffed_full_update(arguments)
+            await asyncio.to_thread(self.workflow_cache.invalidate, api_url, arguments.get("id"))
+            if diffed is not None:
+                return diffed
+        elif api_url and tool_name in CACHEABLE_READ_TOOLS and arguments.get("id"):
+            cached = await self._cached_workflow_view(tool_name, arguments)
+            if cached is not None:
+                return cached
+        elif api_url and tool_name == "n8n_list_executions":
+            texts = await asyncio.to_thread(take_prefetched_executions, api_url, arguments)
+            if texts is not None:
+                log.debug("prefetch.hit", tool=tool_name, workflowId=arguments.get("workflowId"))
+                return [types.TextContent(type="text", text=text) for text in texts]
+
+        validation_key = None
+        if tool_name in VALIDATION_TOOLS:
+            validation_key = ValidationCache.key(tool_name, arguments, self.server_version)
+            cached = await asyncio.to_thread(self.validation_cache.get, validation_key)
+            if cached is not None:
+                log.debug("validation_cache.hit", tool=tool_name)
+                return [types.TextContent(type="text", text=text) for text in cached]
+
+        content, answered = await self._call_backend_outcome(tool_name, arguments)
+
+        if api_url and tool_name in SNAPSHOT_SOURCE_TOOLS:
+            await asyncio.to_thread(self._store_workflow_snapshot, tool_name, api_url, arguments.get("apiKey"), content)
+        if validation_key is not None and answered:
+            await asyncio.to_thread(self.validation_cache.store, validation_key, [item.text for item in content])
+
+        return content
+
+    async def _call_backend(self, tool_name: str, arguments: dict) -> list[types.TextContent]:
+        """Forward a tools/call request to the n8n-mcp server under the tool's call policy."""
+        content, _ = await self._call_backend_outcome(tool_name, arguments)
+        return content
+
+    async def _call_backend_outcome(self, tool_name: str, arguments: dict) -> tuple[list[types.TextContent], bool]:
+        """Like _call_backend, also telling whether n8n-mcp itself answered the call.
+
+        Timeouts, circuit rejections, lost calls and transient errors are
+        reported with answered=False, so they are never cached as results.
+        """
+        policy = self.call_policies.get(tool_name)
+        api_url = arguments.get("apiUrl") if tool_name in self.n8n_management_tools else None
+        if api_url:
+            retry_after = await asyncio.to_thread(self.circuit_breakers.retry_after, api_url)
+            if retry_after is not None:
+                log.warning("circuit.rejected", tool=tool_name, apiUrl=api_url, retryAfterSeconds=round(retry_after, 1))
+                return [types.TextContent(type="text", text=circuit_open_error(api_url, retry_after))], False
+
+        content = []
+        transient = True
+        for attempt in range(1, policy.max_attempts + 1):
+            if attempt > 1:
+                self.retries += 1
+                await asyncio.sleep(retry_delay(attempt - 1))
+            try:
+                content = await self._hedged_request(tool_name, arguments, policy)
+                transient = is_transient_error(_parse_tool_json(content))
+            except TimeoutError:
+                self.timeouts += 1
+                log.warning("tool.timeout", tool=tool_name, timeoutSeconds=policy.timeout_seconds, attempt=attempt, maxAttempts=policy.max_attempts)
+                content = [types.TextContent(type="text", text=timeout_error(tool_name, policy, attempt))]
+                transient = True
+            if not transient:
+                break
+        # One outcome per call, so the threshold counts failed calls rather than attempts
+        if api_url:
+            if transient:
+                await asyncio.to_thread(self.circuit_breakers.record_failure, api_url)
+            elif api_url in self.circuit_breakers.failing:
+                await asyncio.to_thread(self.circuit_breakers.record_success, api_url)
+        payload = _parse_tool_json(content)
+        answered = bool(content) and not transient and not (payload and payload.get("errorType"))
+        return content, answered
+
+    async def _hedged_request(self, tool_name: str, arguments: dict, policy: CallPolicy) -> list[types.TextContent]:
+        """Send a tool call, plus one duplicate if it is slower than usual; the first response wins."""
+        started = time.monotonic()
+        hedge_delay = self.latency.hedge_delay(tool_name, policy)
+        tasks = {asyncio.create_task(self._request_tool(tool_name, arguments))}
+        try:
+            async with asyncio.timeout(policy.timeout_seconds):
+                if hedge_delay is not None and hedge_delay < policy.timeout_seconds:
+                    done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                    if not done:
+                        self.hedges += 1
+                        log.info("tool.hedged", tool=tool_name, afterSeconds=round(hedge_delay, 2))
+                        tasks.add(asyncio.create_task(self._request_tool(tool_name, arguments)))
+                while True:
+                    done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            self.latency.record(tool_name, time.monotonic() - started)
+                            return task.result()
+                    if not tasks:
+                        raise done.pop().exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _request_tool(self, tool_name: str, arguments: dict) -> list[types.TextContent]:
+        """Send one tools/call request to the n8n-mcp server and wait for its response."""
+        log.payload("tool.arguments", arguments, tool=tool_name)
         
         request = {
             "jsonrpc": "2.0",
@@ -213,16 +629,19 @@ class DirectMCPClient:
             }
         }
         
-        await self._send_request(request)
-        response = await self._read_response()
+        try:
+            response = await self._request(request, idempotent=tool_name not in SIDE_EFFECT_TOOLS)
+        except BackendUnavailableError:
+            return [types.TextContent(type="text", text=backend_restarted_error(tool_name))]
+        self._calls_since_spawn += 1
+        if config.backend_recycle_calls and self._calls_since_spawn >= config.backend_recycle_calls:
+            self._recycle_reason = f"recycled after {self._calls_since_spawn} calls"
         
         if "error" in response:
-            print(f"❌ ERROR in tools/call: {response['error']}", file=sys.stderr)
+            log.error("tool.failed", tool=tool_name, error=response['error'])
             return []
         
         result = response.get("result", {})
-        print(f"✅ SUCCESS: Tool call completed", file=sys.stderr)
-        print(f"📊 Result structure: {list(result.keys())}", file=sys.stderr)
         
         # Convert to MCP TextContent objects
         content_data = result.get("content", [])
@@ -236,6 +655,254 @@ class DirectMCPClient:
         
         return content
 
+    async def _current_snapshot(self, arguments: dict, always_revalidate: bool = False
+                                ) -> tuple[WorkflowSnapshot | None, list[types.TextContent] | None]:
+        """Return the cached snapshot if it is still current, revalidating on updatedAt.
+
+        Fresh snapshots skip revalidation unless always_revalidate is set. Also returns
+        the n8n_get_workflow_minimal result when revalidation fetched one.
+        """
+        api_url = arguments["apiUrl"]
+        workflow_id = arguments["id"]
+        api_key = arguments.get("apiKey")
+        snapshot = await asyncio.to_thread(self.workflow_cache.get, api_url, api_key, workflow_id)
+        if snapshot is None or (self.workflow_cache.is_fresh(snapshot) and not always_revalidate):
+            return snapshot, None
+
+        # Cheap revalidation: the minimal view carries updatedAt
+        minimal_content = await self._call_backend("n8n_get_workflow_minimal", {
+            "id": workflow_id,
+            "apiUrl": api_url,
+            "apiKey": api_key
+        })
+        minimal = _parse_tool_json(minimal_content)
+        if not minimal or not minimal.get("success"):
+            await asyncio.to_thread(self.workflow_cache.invalidate, api_url, workflow_id)
+            return None, None
+        updated_at = (minimal.get("data") or {}).get("updatedAt")
+        if not await asyncio.to_thread(self.workflow_cache.revalidate, api_url, api_key, workflow_id, updated_at):
+            return None, minimal_content
+        return snapshot, minimal_content
+
+    async def _cached_workflow_view(self, tool_name: str, arguments: dict) -> list[types.TextContent] | None:
+        """Serve a workflow read from the snapshot cache."""
+        snapshot, minimal_content = await self._current_snapshot(arguments)
+        if snapshot is None:
+            if tool_name == "n8n_get_workflow_minimal":
+                return minimal_content
+            return None
+
+        self.workflow_cache.hits += 1
+        if snapshot.prefetched:
+            snapshot.prefetched = False
+            await asyncio.to_thread(record_prefetch_hit)
+            log.debug("prefetch.hit", tool=tool_name, workflowId=arguments['id'])
+        log.debug("workflow_cache.hit", tool=tool_name, workflowId=arguments['id'])
+        return [types.TextContent(
+            type="text",
+            text=json.dumps({
+                "success": True,
+                "data": workflow_view(tool_name, snapshot.workflow)
+            })
+        )]
+
+    async def _diffed_full_update(self, arguments: dict) -> list[types.TextContent] | None:
+        """Send a full workflow update as a partial update when the diff is unambiguous."""
+        # The diff base must match n8n right now: a save in the editor moments ago would
+        # otherwise turn the intended overwrite into operations against a stale base
+        snapshot, _ = await self._current_snapshot(arguments, always_revalidate=True)
+        if snapshot is None:
+            return None
+        operations = diff_workflow(snapshot.workflow, arguments)
+        if operations is None:
+            self.diff_fallbacks += 1
+            return None
+
+        content = await self._call_backend("n8n_update_partial_workflow", {
+            "id": arguments["id"],
+            "operations": operations,
+            "apiUrl": arguments["apiUrl"],
+            "apiKey": arguments.get("apiKey")
+        })
+        result = _parse_tool_json(content)
+        if result and result.get("errorType"):
+            # Timed out or circuit open: the full update would fail the same way
+            return content
+        if not result or not result.get("success"):
+            # Partial updates are applied atomically, so the full update is still safe
+            self.diff_fallbacks += 1
+            return None
+
+        self.diffed_updates += 1
+        log.info("workflow.diffed_update", workflowId=arguments['id'], operations=len(operations))
+        return content
+
+    async def prefetch_workflow(self, api_url: str, api_key: str, workflow_id: str, fresh_seconds: float) -> None:
+        """Fetch a workflow and its recent executions into the shared cache for the proxy of a starting run."""
+        credentials = {"apiUrl": api_url, "apiKey": api_key}
+        workflow_content, executions_content = await asyncio.gather(
+            self._call_backend("n8n_get_workflow", {"id": workflow_id, **credentials}),
+            self._call_backend("n8n_list_executions", {
+                "workflowId": workflow_id, "limit": PREFETCH_EXECUTIONS_LIMIT, **credentials
+            })
+        )
+        payload = _parse_tool_json(workflow_content)
+        if payload and payload.get("success"):
+            await asyncio.to_thread(self._store_workflow_snapshot, "n8n_get_workflow", api_url, api_key, workflow_content)
+            await asyncio.to_thread(mark_prefetched, api_url, api_key, workflow_id, fresh_seconds)
+        payload = _parse_tool_json(executions_content)
+        if payload and payload.get("success"):
+            await asyncio.to_thread(
+                store_prefetched_executions,
+                api_url, api_key, workflow_id, [item.text for item in executions_content], fresh_seconds
+            )
+
+    async def call_n8n_tool(self, api_url: str, api_key: str, tool_name: str, arguments: dict | None = None) -> dict | None:
+        """Call a management tool with explicit credentials and return its parsed payload."""
+        content = await self._call_backend(tool_name, {**(arguments or {}), "apiUrl": api_url, "apiKey": api_key})
+        return _parse_tool_json(content)
+
+    def _store_workflow_snapshot(self, tool_name: str, api_url: str, api_key: str | None,
+                                 content: list[types.TextContent]) -> None:
+        """Store the full workflow from a successful read tool response."""
+        payload = _parse_tool_json(content)
+        if not payload or not payload.get("success"):
+            return
+        data = payload.get("data") or {}
+        workflow = data.get("workflow") if tool_name == "n8n_get_workflow_details" else data
+        if isinstance(workflow, dict) and "nodes" in workflow:
+            self.workflow_cache.store(api_url, api_key, workflow)
+
+    def _batch_tool(self) -> types.Tool:
+        """Describe the proxy-level batch tool."""
+        return types.Tool(
+            name=BATCH_TOOL_NAME,
+            description=(
+                "Run several read-only tool calls (e.g. get_node_essentials, search_node_properties, "
+                "search_nodes) concurrently in one request. Results are returned in the same order as "
+                "the calls, each with its own success flag and error. Tools that create, update or "
+                f"delete anything are not allowed. At most {MAX_BATCH_CALLS} calls per batch."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "calls": {
+                        "type": "array",
+                        "description": "Tool calls to run",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": {"type": "string", "description": "Tool name"},
+                                "arguments": {"type": "object", "description": "Tool arguments"}
+                            },
+                            "required": ["name"]
+                        },
+                        "maxItems": MAX_BATCH_CALLS
+                    },
+                    "maxConcurrency": {
+                        "type": "integer",
+                        "description": f"Maximum calls in flight at once (default {DEFAULT_BATCH_CONCURRENCY}, max {MAX_BATCH_CONCURRENCY})"
+                    }
+                },
+                "required": ["calls"]
+            }
+        )
+
+    async def _batch_tool_calls(self, arguments: dict) -> list[types.TextContent]:
+        """Fan a batch of tool calls out to the backend and collect results in order."""
+        calls = arguments.get("calls")
+        if not isinstance(calls, list) or not calls:
+            error = "calls must be a non-empty array"
+        elif len(calls) > MAX_BATCH_CALLS:
+            error = f"At most {MAX_BATCH_CALLS} calls per batch"
+        else:
+            error = None
+        if error:
+            return [types.TextContent(
+                type="text",
+                text=json.dumps({"success": False, "error": error})
+            )]
+
+        try:
+            concurrency = int(arguments.get("maxConcurrency", DEFAULT_BATCH_CONCURRENCY))
+        except (TypeError, ValueError):
+            concurrency = DEFAULT_BATCH_CONCURRENCY
+        semaphore = asyncio.Semaphore(max(1, min(concurrency, MAX_BATCH_CONCURRENCY)))
+
+        async def run(call) -> dict:
+            name = call.get("name") if isinstance(call, dict) else None
+            if not name:
+                return {"name": name, "success": False, "error": "Missing tool name"}
+            if name not in BATCH_ALLOWED_TOOLS:
+                return {"name": name, "success": False, "error": f"'{name}' cannot be batched, call it directly"}
+            async with semaphore:
+                try:
+                    content = await self.call_tool(name, dict(call.get("arguments") or {}))
+                except Exception as e:
+                    return {"name": name, "success": False, "error": str(e)}
+            if not content:
+                return {"name": name, "success": False, "error": "Tool call failed"}
+            return {"name": name, "success": True, "result": _content_value(content)}
+
+        log.debug("batch.started", calls=len(calls))
+        results = await asyncio.gather(*(run(call) for call in calls))
+        return [types.TextContent(
+            type="text",
+            text=json.dumps({"success": True, "results": results})
+        )]
+
+    def _credentials_tool(self) -> types.Tool:
+        """Describe the proxy-level credentials lookup tool."""
+        return types.Tool(
+            name=CREDENTIALS_TOOL_NAME,
+            description=(
+                "Look up the n8n credentials available on the user's instance. Filter by credential "
+                "type (e.g. 'slackApi', 'gmailOAuth2') and/or name; both match case-insensitive substrings. "
+                "Returns id, name and type of each match."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "apiUuid": {
+                        "type": "string",
+                        "description": "UUID reference to stored n8n API credentials"
+                    },
+                    "type": {"type": "string", "description": "Credential type to match"},
+                    "name": {"type": "string", "description": "Credential name to match"}
+                },
+                "required": ["apiUuid"]
+            }
+        )
+
+    def _lookup_credentials(self, arguments: dict) -> list[types.TextContent]:
+        """Filter the credential catalogue referenced by the request's API credentials."""
+        api_uuid = arguments.get("apiUuid")
+        cred_path = self.cred_dir / f"{api_uuid}.json"
+        if not api_uuid or not os.path.exists(cred_path):
+            return [types.TextContent(
+                type="text",
+                text=json.dumps({
+                    "success": False,
+                    "error": f"No credentials found for UUID {api_uuid}"
+                })
+            )]
+
+        catalog_key = _read_credential(cred_path).credentials_catalog
+        catalog = credential_catalog.load(catalog_key) if catalog_key else None
+        if catalog is None:
+            return [types.TextContent(
+                type="text",
+                text=json.dumps({
+                    "success": False,
+                    "error": "The credentials list of this n8n instance is not available"
+                })
+            )]
+        credentials = catalog.find(cred_type=arguments.get("type"), name=arguments.get("name"))
+        return [types.TextContent(
+            type="text",
+            text=json.dumps({"success": True, "data": {"credentials": credentials, "count": len(credentials)}})
+        )]
+
     def _modify_tool_schema(self, tool_data: dict) -> dict:
         """Modify n8n management tool schemas to use apiUuid instead of apiUrl/apiKey."""
         if tool_data.get("name") not in self.n8n_management_tools:
@@ -282,6 +949,40 @@ class DirectMCPClient:
             del self.credential_store[api_uuid]
 
 
+def _log_connect_failure(task: asyncio.Task) -> None:
+    """Retrieve and log a failed background connection, which no call may ever await."""
+    if not task.cancelled() and task.exception() is not None:
+        log.error("backend.connect_failed", error=str(task.exception()))
+
+
+def _read_credential(path: Path):
+    """Read stored credentials; pydantic is only imported once credentials are needed."""
+    from n8n_credential import N8NCredential
+    return N8NCredential.read(path)
+
+
+def _parse_tool_json(content: list[types.TextContent]) -> dict | None:
+    """Parse the JSON body of a single-text tool result, if it is one."""
+    if len(content) != 1:
+        return None
+    try:
+        payload = json.loads(content[0].text)
+    except json.JSONDecodeError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def _content_value(content: list[types.TextContent]):
+    """Embed a tool result in a batch response, parsing JSON text where possible."""
+    values = []
+    for item in content:
+        try:
+            values.append(json.loads(item.text))
+        except json.JSONDecodeError:
+            values.append(item.text)
+    return values[0] if len(values) == 1 else values
+
+
 async def main():
     """Main test function."""
     print("🚀 Starting Direct MCP Client Test", file=sys.stderr)
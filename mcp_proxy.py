@@ -1,60 +1,207 @@
-from collections.abc import AsyncIterator
-from contextlib import asynccontextmanager
+"""
+MCP proxy between Claude and the n8n-mcp server.
 
-import mcp.server.stdio
-import mcp.types as types
-from mcp.server.lowlevel import NotificationOptions, Server
-from mcp.server.models import InitializationOptions
+The MCP SDK import alone takes most of the proxy's cold start. The backend node
+process is started first and the SDK is imported in a worker thread while node
+boots. Until the import finishes, EarlyStdio answers initialize and tools/list
+(from the cached tool list) itself and holds back everything else; it then
+replays the held messages, initialize included, to the SDK server and carries
+on as its stdio transport. mcp_calling itself works with the lightweight
+tool_content records and never imports the SDK.
+"""
 
+import asyncio
+import json
+import sys
+from io import TextIOWrapper
+
+import proxy_log as log
 from mcp_calling import DirectMCPClient
 
+SERVER_NAME = "n8n-mcp-proxy"
+SERVER_VERSION = "0.1.0"
+
+# What the SDK server answers initialize with (mcp.shared.version, ServerSession); checked at hand-over
+SUPPORTED_PROTOCOL_VERSIONS = ["2024-11-05", "2025-03-26", "2025-06-18"]
+LATEST_PROTOCOL_VERSION = "2025-06-18"
+SERVER_CAPABILITIES = {"experimental": {}, "tools": {"listChanged": False}}
+
+
+def build_server(client: DirectMCPClient):
+    """Create the MCP SDK server forwarding list_tools and call_tool to the client."""
+    import mcp.types as types
+    from mcp.server.lowlevel import Server
+
+    server = Server(SERVER_NAME)
+
+    @server.list_tools()
+    async def list_tools() -> list[types.Tool]:
+        tools = await client.list_tools()
+        return [
+            types.Tool(name=tool.name, description=tool.description, inputSchema=tool.inputSchema)
+            for tool in tools
+        ]
+
+    # Arguments are validated by n8n-mcp and the proxy-level tools themselves
+    @server.call_tool(validate_input=False)
+    async def call_tool(name: str, arguments: dict) -> list[types.TextContent]:
+        content = await client.call_tool(name, arguments)
+        return [types.TextContent(type="text", text=item.text) for item in content]
+
+    return server
+
+
+def initialize_result(params: dict) -> dict:
+    """The initialize result the SDK server would send for these request params."""
+    requested = params.get("protocolVersion")
+    return {
+        "protocolVersion": requested if requested in SUPPORTED_PROTOCOL_VERSIONS else LATEST_PROTOCOL_VERSION,
+        "capabilities": SERVER_CAPABILITIES,
+        "serverInfo": {"name": SERVER_NAME, "version": SERVER_VERSION}
+    }
 
-@asynccontextmanager
-async def server_lifespan(_server: Server) -> AsyncIterator[dict]:
-    client = await DirectMCPClient().connect()
-    try:
-        yield {'client': client}
-    finally:
-        await client.disconnect()
-        
 
-server = Server('n8n-mcp-proxy', lifespan=server_lifespan)
+class EarlyStdio:
+    """Stdio transport that answers the start of the session before the SDK is loaded.
 
+    stdin() and stdout() are passed to the SDK's stdio_server once the server
+    exists: stdin() first replays the held lines, and stdout() drops the SDK's
+    own answer to the replayed initialize, which the client already has.
+    """
 
-@server.list_tools()
-async def list_tools() -> list[types.Tool]:
-    ctx = server.request_context
-    client = ctx.lifespan_context['client']
-    return await client.list_tools()
+    def __init__(self, client: DirectMCPClient):
+        self.client = client
+        self._stdin = TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+        self._stdout = TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+        self._held: list[str] = []
+        self._pending_read: asyncio.Task | None = None
+        self._initialize_id = None
+        self._initialize_answer: dict | None = None
 
+    async def serve_until(self, ready: asyncio.Future) -> None:
+        """Answer initialize and tools/list until `ready` completes; hold everything else."""
+        while True:
+            if self._pending_read is None:
+                self._pending_read = asyncio.create_task(asyncio.to_thread(self._stdin.readline))
+            await asyncio.wait({self._pending_read, ready}, return_when=asyncio.FIRST_COMPLETED)
+            if not self._pending_read.done():
+                return
+            line = self._pending_read.result()
+            self._pending_read = None
+            if not line:
+                return
+            if not await self._answer_early(line):
+                self._held.append(line)
+            if ready.done():
+                return
 
-@server.call_tool()
-async def call_tool(name: str, arguments: dict) -> list[types.TextContent]:
-    ctx = server.request_context
-    client = ctx.lifespan_context['client']
+    async def _answer_early(self, line: str) -> bool:
+        """Answer the message if it can be answered without the SDK."""
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            return False
+        if not isinstance(message, dict) or "id" not in message:
+            return False
+        method = message.get("method")
+        if method == "initialize" and self._initialize_id is None:
+            self._initialize_id = message["id"]
+            self._initialize_answer = initialize_result(message.get("params") or {})
+            # The SDK server still has to see initialize to start its session
+            self._held.append(line)
+            await self._write_message({"jsonrpc": "2.0", "id": message["id"], "result": self._initialize_answer})
+            return True
+        if method == "tools/list" and self._initialize_id is not None:
+            try:
+                tools = await self.client.list_tools()
+            except Exception as e:
+                log.warning("early.tools_list_failed", error=str(e))
+                return False
+            result = {"tools": [
+                {"name": tool.name, "description": tool.description, "inputSchema": tool.inputSchema}
+                for tool in tools
+            ]}
+            await self._write_message({"jsonrpc": "2.0", "id": message["id"], "result": result})
+            return True
+        return False
+
+    async def _write_message(self, message: dict) -> None:
+        await asyncio.to_thread(self._write_flush, json.dumps(message, separators=(",", ":")) + "\n")
+
+    async def stdin(self):
+        """Held lines first, then the rest of stdin."""
+        for line in self._held:
+            yield line
+        self._held = []
+        while True:
+            if self._pending_read is not None:
+                line = await self._pending_read
+                self._pending_read = None
+            else:
+                line = await asyncio.to_thread(self._stdin.readline)
+            if not line:
+                return
+            yield line
+
+    def stdout(self) -> "EarlyStdio":
+        return self
+
+    async def write(self, text: str) -> None:
+        if self._initialize_id is not None and self._is_initialize_answer(text):
+            return
+        await asyncio.to_thread(self._write_flush, text)
+
+    async def flush(self) -> None:
+        """Writes are flushed as they are made."""
+
+    def _write_flush(self, text: str) -> None:
+        self._stdout.write(text)
+        self._stdout.flush()
+
+    def _is_initialize_answer(self, text: str) -> bool:
+        """Whether text is the SDK's answer to the replayed initialize; checks it matches ours."""
+        message = json.loads(text)
+        if message.get("id") != self._initialize_id or "method" in message:
+            return False
+        self._initialize_id = None
+        if message.get("result") != self._initialize_answer:
+            log.warning("early.initialize_mismatch", early=self._initialize_answer, sdk=message.get("result"))
+        return True
 
-    results = await client.call_tool(name, arguments)
-    return results
-    
 
 async def run():
-    """Run the server with lifespan management."""
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="n8n-mcp-proxy",
-                server_version="0.1.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
+    """Run the server, connecting to the backend in the background."""
+    client = DirectMCPClient().start()
+    try:
+        # Import the SDK while node starts up, answering the session start meanwhile
+        server_ready = asyncio.ensure_future(asyncio.to_thread(build_server, client))
+        stdio = EarlyStdio(client)
+        await stdio.serve_until(server_ready)
+        server = await server_ready
+        import mcp.server.stdio
+        from mcp.server.lowlevel import NotificationOptions
+        from mcp.server.models import InitializationOptions
+
+        async with mcp.server.stdio.stdio_server(stdio.stdin(), stdio.stdout()) as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name=SERVER_NAME,
+                    server_version=SERVER_VERSION,
+                    capabilities=server.get_capabilities(
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={},
+                    ),
                 ),
-            ),
-        )
+            )
+    finally:
+        await client.disconnect()
 
 
 if __name__ == "__main__":
-    import asyncio
-
-    asyncio.run(run())
+    if "--profile-startup" in sys.argv:
+        from startup_profile import profile_proxy_startup
+        profile_proxy_startup()
+    else:
+        asyncio.run(run())
@@ -1,11 +1,14 @@
 from pydantic import BaseModel
 import json
 from pathlib import Path
+from typing import Optional
 
 
 class N8NCredential(BaseModel):
     api_key: str
     api_url: str
+    # Shared state key of the instance's credential catalogue, for lookups from the proxy
+    credentials_catalog: Optional[str] = None
 
     def write(self, path: Path) -> None:
         with open(path, "w") as f:
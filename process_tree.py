@@ -0,0 +1,248 @@
+"""
+Resource accounting and limits for the process tree of one Claude run.
+
+Each run (claude -> mcp_proxy.py -> node) is started in a new session, so the
+whole tree can be found in /proc by session ID and signalled as one process
+group. When a writable cgroup v2 directory is configured, the tree also gets its
+own cgroup: the kernel then enforces the memory limit and CPU time includes
+processes that have already exited.
+"""
+
+import asyncio
+import os
+import signal
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+SAMPLE_INTERVAL_SECONDS = 1.0
+# Time between SIGTERM and SIGKILL when a tree is stopped
+KILL_GRACE_SECONDS = 2.0
+
+# Totals over all runs of this worker
+metrics = {
+    "runs": 0,
+    "killed": 0,
+    "cpuSeconds": 0.0,
+    "maxPeakRssBytes": 0
+}
+
+# Trees of this worker that have not been closed yet
+live_trees: set["ProcessTree"] = set()
+
+
+@dataclass
+class TreeLimits:
+    max_rss_bytes: int = 0
+    max_cpu_seconds: float = 0.0
+    max_wall_seconds: float = 0.0
+
+
+@dataclass
+class TreeUsage:
+    rss_bytes: int = 0
+    peak_rss_bytes: int = 0
+    cpu_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    processes: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "peakRssMb": round(self.peak_rss_bytes / 2**20, 1),
+            "cpuSeconds": round(self.cpu_seconds, 2),
+            "wallSeconds": round(self.wall_seconds, 2),
+            "processes": self.processes
+        }
+
+
+def sample_session(session_id: int) -> tuple[int, float, int]:
+    """Sum RSS bytes and CPU seconds over every live process in a session."""
+    rss_bytes = 0
+    cpu_ticks = 0
+    count = 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            stat = Path(f"/proc/{entry}/stat").read_text()
+        except OSError:
+            continue
+        # Fields after the parenthesised command name, starting at field 3 (state)
+        fields = stat[stat.rfind(")") + 2:].split()
+        if int(fields[3]) != session_id:
+            continue
+        count += 1
+        # utime, stime and the CPU time of children already reaped by this process
+        cpu_ticks += sum(int(value) for value in fields[11:15])
+        rss_bytes += int(fields[21]) * PAGE_SIZE
+    return rss_bytes, cpu_ticks / CLOCK_TICKS, count
+
+
+def process_rss_bytes(pid: int) -> int:
+    """Resident memory of a single process."""
+    return int(Path(f"/proc/{pid}/statm").read_text().split()[1]) * PAGE_SIZE
+
+
+class RunCgroup:
+    """A cgroup v2 child directory holding one run's process tree."""
+
+    def __init__(self, root: str, max_rss_bytes: int = 0):
+        self.path = Path(root) / f"run-{uuid.uuid4().hex[:12]}"
+        self.path.mkdir()
+        if max_rss_bytes:
+            (self.path / "memory.max").write_text(str(max_rss_bytes))
+            (self.path / "memory.swap.max").write_text("0")
+
+    def add(self, pid: int) -> None:
+        (self.path / "cgroup.procs").write_text(str(pid))
+
+    def cpu_seconds(self) -> float:
+        for line in (self.path / "cpu.stat").read_text().splitlines():
+            key, value = line.split()
+            if key == "usage_usec":
+                return int(value) / 1_000_000
+        return 0.0
+
+    def oom_killed(self) -> bool:
+        for line in (self.path / "memory.events").read_text().splitlines():
+            key, value = line.split()
+            if key == "oom_kill":
+                return int(value) > 0
+        return False
+
+    def kill(self) -> None:
+        kill_file = self.path / "cgroup.kill"
+        if kill_file.exists():
+            kill_file.write_text("1")
+
+    def remove(self) -> bool:
+        try:
+            self.path.rmdir()
+            return True
+        except OSError:
+            return False
+
+
+class ProcessTree:
+    """Samples and enforces limits on a subprocess started with start_new_session=True."""
+
+    def __init__(self, process: asyncio.subprocess.Process, limits: TreeLimits, cgroup_root: str | None = None):
+        self.process = process
+        self.limits = limits
+        self.usage = TreeUsage()
+        self.violation: str | None = None
+        self.started_at = time.monotonic()
+        self.cgroup: RunCgroup | None = None
+        self._monitor: asyncio.Task | None = None
+        if cgroup_root:
+            try:
+                self.cgroup = RunCgroup(cgroup_root, limits.max_rss_bytes)
+                self.cgroup.add(process.pid)
+            except OSError as e:
+                print(f"Could not place run in a cgroup under {cgroup_root}: {e}")
+                if self.cgroup:
+                    self.cgroup.remove()
+                self.cgroup = None
+
+    def start(self) -> "ProcessTree":
+        self._monitor = asyncio.create_task(self._run())
+        live_trees.add(self)
+        return self
+
+    def sample(self) -> TreeUsage:
+        """Refresh and return the tree's resource usage."""
+        rss_bytes, cpu_seconds, count = sample_session(self.process.pid)
+        if self.cgroup:
+            try:
+                cpu_seconds = self.cgroup.cpu_seconds()
+            except OSError:
+                pass
+        usage = self.usage
+        usage.wall_seconds = time.monotonic() - self.started_at
+        if count:
+            usage.rss_bytes = rss_bytes
+            usage.peak_rss_bytes = max(usage.peak_rss_bytes, rss_bytes)
+            usage.processes = max(usage.processes, count)
+        # Exited processes drop out of the sample, so never let CPU time go backwards
+        usage.cpu_seconds = max(usage.cpu_seconds, cpu_seconds)
+        return usage
+
+    def _check(self, usage: TreeUsage) -> str | None:
+        limits = self.limits
+        if self.cgroup and self.cgroup.oom_killed():
+            return f"Run stopped: it exceeded the {limits.max_rss_bytes // 2**20} MB memory limit"
+        if limits.max_rss_bytes and usage.rss_bytes > limits.max_rss_bytes:
+            return f"Run stopped: memory use of {usage.rss_bytes // 2**20} MB exceeded the {limits.max_rss_bytes // 2**20} MB limit"
+        if limits.max_cpu_seconds and usage.cpu_seconds > limits.max_cpu_seconds:
+            return f"Run stopped: CPU time of {usage.cpu_seconds:.0f}s exceeded the {limits.max_cpu_seconds:.0f}s limit"
+        if limits.max_wall_seconds and usage.wall_seconds > limits.max_wall_seconds:
+            return f"Run stopped: it took longer than the {limits.max_wall_seconds:.0f}s limit"
+        return None
+
+    async def _run(self) -> None:
+        while self.process.returncode is None:
+            try:
+                usage = await asyncio.to_thread(self.sample)
+                violation = self._check(usage)
+            except Exception as e:
+                print(f"Error sampling process tree {self.process.pid}: {e}")
+                violation = None
+            if violation:
+                self.violation = violation
+                await self.kill()
+                return
+            await asyncio.sleep(SAMPLE_INTERVAL_SECONDS)
+
+    def _signal(self, signum: int) -> None:
+        try:
+            os.killpg(self.process.pid, signum)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    async def kill(self) -> None:
+        """Stop the whole tree: SIGTERM, then SIGKILL after a grace period."""
+        self._signal(signal.SIGTERM)
+        await asyncio.sleep(KILL_GRACE_SECONDS)
+        self._signal(signal.SIGKILL)
+        if self.cgroup:
+            self.cgroup.kill()
+
+    def kill_now(self) -> None:
+        """SIGKILL the whole tree without waiting."""
+        self._signal(signal.SIGKILL)
+        if self.cgroup:
+            self.cgroup.kill()
+
+    async def close(self) -> None:
+        """Stop monitoring, kill leftover processes and record the run in metrics."""
+        if self._monitor:
+            self._monitor.cancel()
+        try:
+            await asyncio.to_thread(self.sample)
+        except Exception:
+            pass
+        # Processes outliving claude (e.g. an orphaned node backend) are not kept around
+        self.kill_now()
+        live_trees.discard(self)
+        if self.cgroup:
+            # The cgroup can only be removed once the killed processes are gone
+            for _ in range(20):
+                if self.cgroup.remove():
+                    break
+                await asyncio.sleep(0.05)
+        metrics["runs"] += 1
+        metrics["killed"] += 1 if self.violation else 0
+        metrics["cpuSeconds"] += self.usage.cpu_seconds
+        metrics["maxPeakRssBytes"] = max(metrics["maxPeakRssBytes"], self.usage.peak_rss_bytes)
+
+
+def kill_live_trees() -> int:
+    """SIGKILL every tree not closed yet, e.g. when the worker exits with runs still going."""
+    trees = list(live_trees)
+    for tree in trees:
+        tree.kill_now()
+    return len(trees)
@@ -0,0 +1,102 @@
+"""
+Structured logging for the MCP proxy.
+
+Records are single-line JSON on stderr with an event name plus small fields
+(sizes, timings, IDs). Request and response bodies are only serialised at
+DEBUG level, for a sample of calls, truncated and with secrets redacted, so the
+production hot path does no logging serialisation at all.
+"""
+
+import json
+import logging
+import random
+import sys
+import time
+
+from config import config
+
+# Longest payload preview written at DEBUG level
+PAYLOAD_PREVIEW_CHARS = 2000
+
+# Keys whose values are never logged, compared lowercased without '_' and '-'
+SECRET_KEYS = {
+    'apikey', 'xn8napikey', 'authtoken', 'token', 'accesstoken', 'refreshtoken',
+    'password', 'secret', 'clientsecret', 'authorization'
+}
+
+logger = logging.getLogger("mcp_proxy")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "event": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def _configure() -> None:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(config.log_level)
+    logger.propagate = False
+
+
+_configure()
+
+
+def _log(level: int, event: str, fields: dict) -> None:
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+
+def debug(event: str, **fields) -> None:
+    _log(logging.DEBUG, event, fields)
+
+
+def info(event: str, **fields) -> None:
+    _log(logging.INFO, event, fields)
+
+
+def warning(event: str, **fields) -> None:
+    _log(logging.WARNING, event, fields)
+
+
+def error(event: str, **fields) -> None:
+    _log(logging.ERROR, event, fields)
+
+
+def debug_enabled() -> bool:
+    return logger.isEnabledFor(logging.DEBUG)
+
+
+def redact(value):
+    """Copy a JSON value with the values of secret keys replaced."""
+    if isinstance(value, dict):
+        return {
+            key: "[redacted]" if key.lower().replace("_", "").replace("-", "") in SECRET_KEYS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def payload(event: str, body, **fields) -> None:
+    """Log a redacted, truncated body at DEBUG level for a sample of calls."""
+    if not debug_enabled() or random.random() >= config.log_payload_sample_rate:
+        return
+    preview = json.dumps(redact(body), separators=(",", ":"), ensure_ascii=False, default=str)
+    if len(preview) > PAYLOAD_PREVIEW_CHARS:
+        fields["truncatedFrom"] = len(preview)
+        preview = preview[:PAYLOAD_PREVIEW_CHARS]
+    debug(event, body=preview, **fields)
+
+
+def elapsed_ms(started: float) -> float:
+    """Milliseconds since a time.monotonic() reading."""
+    return round((time.monotonic() - started) * 1000, 1)
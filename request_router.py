@@ -0,0 +1,271 @@
+"""
+Latency-tiered routing of /chat messages.
+
+Before a Claude run is started, each message is put in one of three tiers:
+
+- direct: a simple read ("show recent executions", "list my workflows") is
+  answered with one n8n management tool call and a short formatted summary,
+  with no Claude run at all;
+- light: a question that needs no changes runs Claude with a faster model,
+  write tools disallowed and an instruction to answer briefly;
+- full: everything else (building, editing, debugging) keeps the full agent.
+
+A local rule-based classifier decides most messages. It only leaves the full
+path on unambiguous matches: confirmations and short follow-ups ("do it",
+"continue") always go to the full agent, since they usually ask it to apply what
+it just proposed. When the rules are unsure and the message starts a new
+conversation, one small OpenAI call decides if a router model is configured;
+within a session the router has no context, so the message stays on the full
+path. Requests and latency per tier are counted in the shared state broker.
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import shared_state
+from call_policy import SIDE_EFFECT_TOOLS
+
+TIER_DIRECT = "direct"
+TIER_LIGHT = "light"
+TIER_FULL = "full"
+TIERS = (TIER_DIRECT, TIER_LIGHT, TIER_FULL)
+
+# Longer messages are never answered directly
+MAX_DIRECT_MESSAGE_CHARS = 160
+# Executions and workflows listed in a direct answer
+DIRECT_LIST_LIMIT = 10
+
+# Name under which setup.sh registers the proxy with Claude
+MCP_SERVER_NAME = "n8n-mcp"
+
+# Asking for changes, or for analysis that needs the full agent
+WRITE_INTENT = re.compile(
+    r"\b(create|build|make|add|insert|update|change|modify|edit|fix|repair|delete|remove|rename|"
+    r"connect|replace|set ?up|configure|activate|deactivate|enable|disable|run|trigger|execute|"
+    r"deploy|move|copy|duplicate|import|generate|write|implement|debug|why|improve|optimi[sz]e)\b",
+    re.IGNORECASE
+)
+# Confirmations and short follow-ups that refer to earlier turns
+FOLLOW_UP = re.compile(
+    r"^\W*((yes|yeah|yep|ok(ay)?|sure|go ahead|go for it|do (it|that|this|so)|continue|proceed|"
+    r"try (it )?again|again|apply|sounds good|looks good|let'?s (do|go)|same)\b|(and|also|now)\s)",
+    re.IGNORECASE
+)
+# Asking what happened in an execution needs its details, not the list
+DIAGNOSTIC_INTENT = re.compile(
+    r"\b(wrong|fail\w*|errors?|erroring|went|happen\w*|broke\w*|issues?|problems?|details?|output|input|"
+    r"data|results?|stuck|cause)\b",
+    re.IGNORECASE
+)
+EXECUTIONS_QUERY = re.compile(
+    r"^\W*(show|list|get|see|display|give|what are|what were|check|recent|last|latest)\b.{0,40}\b(executions?|runs)\b",
+    re.IGNORECASE
+)
+WORKFLOWS_QUERY = re.compile(
+    r"^\W*(show|list|get|see|display|give|what are|which)\b.{0,30}\bworkflows\b",
+    re.IGNORECASE
+)
+# Only about the n8n instance itself, not a node's or credential's connection
+HEALTH_QUERY = re.compile(
+    r"^\W*(is|are)\s+(my |the |our )?(n8n( instance| server| api)?|instance|server)\s+"
+    r"(up|down|working|reachable|online|running|ok|alive)\W*$",
+    re.IGNORECASE
+)
+# Questions: an interrogative opening, or an auxiliary verb opening with a question mark
+QUESTION_QUERY = re.compile(
+    r"^\W*((what|which|how|explain|describe|tell me|where|when|who)\b|(does|do|is|are|can)\b.*\?\s*$)",
+    re.IGNORECASE
+)
+
+# Appended to the system prompt of light-tier runs
+LIGHT_SYSTEM_PROMPT = (
+    "This message is a question, not a request for changes. Answer it directly and briefly. "
+    "Do not call tools_documentation; use as few tool calls as possible and do not modify anything."
+)
+
+ROUTER_SYSTEM_PROMPT = (
+    "Classify a message sent to an n8n workflow assistant. Reply with JSON {\"route\": ...} where route is one of: "
+    "\"executions\" (only wants to see recent executions), \"workflows\" (only wants to list workflows), "
+    "\"health\" (only asks whether the n8n instance is reachable), \"question\" (a question that needs no "
+    "changes to any workflow), \"build\" (anything that creates, changes, runs or debugs something, or is unclear)."
+)
+
+# Latency histogram bucket bounds in milliseconds
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 5000, 10000, 30000, 60000, 120000, 300000)
+
+
+@dataclass
+class Route:
+    tier: str
+    reason: str
+    # Management tool and arguments answering a direct-tier message
+    tool: Optional[str] = None
+    arguments: dict = field(default_factory=dict)
+
+
+def _direct_route(kind: str, workflow_id: Optional[str], reason: str) -> Route:
+    if kind == "executions":
+        arguments = {"limit": DIRECT_LIST_LIMIT}
+        if workflow_id:
+            arguments["workflowId"] = workflow_id
+        return Route(TIER_DIRECT, reason, "n8n_list_executions", arguments)
+    if kind == "workflows":
+        return Route(TIER_DIRECT, reason, "n8n_list_workflows", {"limit": DIRECT_LIST_LIMIT})
+    return Route(TIER_DIRECT, reason, "n8n_health_check")
+
+
+def classify(message: str, workflow_id: Optional[str] = None) -> Optional[Route]:
+    """Route a message with local rules; None when the rules cannot tell."""
+    text = message.strip()
+    if WRITE_INTENT.search(text):
+        return Route(TIER_FULL, "rules:write-intent")
+    if FOLLOW_UP.search(text):
+        return Route(TIER_FULL, "rules:follow-up")
+    if DIAGNOSTIC_INTENT.search(text):
+        return Route(TIER_FULL, "rules:diagnostic")
+    if len(text) <= MAX_DIRECT_MESSAGE_CHARS:
+        if EXECUTIONS_QUERY.search(text):
+            return _direct_route("executions", workflow_id, "rules:executions")
+        if WORKFLOWS_QUERY.search(text):
+            return _direct_route("workflows", workflow_id, "rules:workflows")
+        if HEALTH_QUERY.search(text):
+            return _direct_route("health", workflow_id, "rules:health")
+    if QUESTION_QUERY.search(text):
+        return Route(TIER_LIGHT, "rules:question")
+    return None
+
+
+def classify_with_model(get_client: Callable, model: str, message: str, workflow_id: Optional[str] = None,
+                        run_usage=None) -> Route:
+    """Route a message with one small OpenAI call; falls back to the full tier on any error.
+
+    The client is created through get_client inside the guarded call, so a missing
+    API key or SDK also sends the message to the full tier.
+    """
+    try:
+        response = get_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": ROUTER_SYSTEM_PROMPT},
+                {"role": "user", "content": message[:2000]}
+            ],
+            response_format={"type": "json_object"},
+            max_tokens=20,
+            temperature=0
+        )
+        if run_usage is not None:
+            run_usage.add_openai(model, response.usage)
+        kind = json.loads(response.choices[0].message.content).get("route")
+    except Exception as e:
+        print(f"Error routing message with {model}: {e}")
+        return Route(TIER_FULL, "model:error")
+    if kind in ("executions", "workflows", "health"):
+        return _direct_route(kind, workflow_id, f"model:{kind}")
+    if kind == "question":
+        return Route(TIER_LIGHT, "model:question")
+    return Route(TIER_FULL, f"model:{kind}")
+
+
+def light_tier_args(model: Optional[str]) -> list[str]:
+    """Extra claude arguments for a light-tier run: faster model, no write tools, brief answers."""
+    args = ["--append-system-prompt", LIGHT_SYSTEM_PROMPT]
+    if model:
+        args.extend(["--model", model])
+    disallowed = [f"mcp__{MCP_SERVER_NAME}__{tool_name}" for tool_name in sorted(SIDE_EFFECT_TOOLS)]
+    args.extend(["--disallowedTools", " ".join(disallowed)])
+    return args
+
+
+def _format_executions(data: dict) -> Optional[str]:
+    if not isinstance(data.get("executions"), list):
+        return None
+    executions = data["executions"]
+    if not executions:
+        return "There are no executions yet."
+    shown = executions[:DIRECT_LIST_LIMIT]
+    lines = [f"Most recent {len(shown)} execution(s):", ""]
+    for execution in shown:
+        status = execution.get("status") or ("success" if execution.get("finished") else "unknown")
+        started = execution.get("startedAt") or "?"
+        workflow = f" (workflow {execution['workflowId']})" if execution.get("workflowId") else ""
+        lines.append(f"- #{execution.get('id')}: {status}, started {started}, {execution.get('mode') or 'unknown'} mode{workflow}")
+    if data.get("nextCursor") or len(executions) > len(shown):
+        lines.append("")
+        lines.append("There are more; ask me to look further back or into a specific execution.")
+    return "\n".join(lines)
+
+
+def _format_workflows(data: dict) -> Optional[str]:
+    if not isinstance(data.get("workflows"), list):
+        return None
+    workflows = data["workflows"]
+    if not workflows:
+        return "There are no workflows on this n8n instance yet."
+    shown = workflows[:DIRECT_LIST_LIMIT]
+    lines = [f"{len(shown)} workflow(s):", ""]
+    for workflow in shown:
+        state = "active" if workflow.get("active") else "inactive"
+        lines.append(f"- {workflow.get('name')} (ID {workflow.get('id')}, {state})")
+    if data.get("nextCursor") or len(workflows) > len(shown):
+        lines.append("")
+        lines.append("There are more workflows; ask me to search for a specific one.")
+    return "\n".join(lines)
+
+
+def _format_health(data: dict) -> str:
+    status = data.get("status") or "ok"
+    version = f", n8n version {data['n8nVersion']}" if data.get("n8nVersion") else ""
+    return f"Your n8n instance is reachable (status: {status}{version})."
+
+
+DIRECT_FORMATTERS = {
+    "n8n_list_executions": _format_executions,
+    "n8n_list_workflows": _format_workflows,
+    "n8n_health_check": _format_health,
+}
+
+
+def format_direct_answer(tool_name: str, payload: Optional[dict]) -> Optional[str]:
+    """Summarise a successful tool result for the user; None if it cannot be answered directly."""
+    if not payload or not payload.get("success") or not isinstance(payload.get("data"), dict):
+        return None
+    return DIRECT_FORMATTERS[tool_name](payload["data"])
+
+
+def record_route(tier: str, seconds: float) -> None:
+    """Count a routed request and its latency in the tier's histogram."""
+    milliseconds = int(seconds * 1000)
+    bucket = next((bound for bound in LATENCY_BUCKETS_MS if milliseconds <= bound), None)
+    shared_state.counter_add(f"route.{tier}.requests")
+    shared_state.counter_add(f"route.{tier}.ms", milliseconds)
+    shared_state.counter_add(f"route.{tier}.le_{bucket if bucket else 'inf'}")
+
+
+def _percentile(counters: dict, tier: str, total: int, fraction: float) -> Optional[int]:
+    """Upper bound of the histogram bucket holding the given fraction of requests."""
+    seen = 0
+    for bound in LATENCY_BUCKETS_MS:
+        seen += counters.get(f"route.{tier}.le_{bound}", 0)
+        if seen >= total * fraction:
+            return bound
+    return None
+
+
+def routing_stats() -> dict:
+    """Share of requests and latency per tier across all workers."""
+    counters = shared_state.counters("route.")
+    total = sum(counters.get(f"route.{tier}.requests", 0) for tier in TIERS)
+    stats = {}
+    for tier in TIERS:
+        requests = counters.get(f"route.{tier}.requests", 0)
+        stats[tier] = {
+            "requests": requests,
+            "share": round(requests / total, 3) if total else None,
+            "meanMs": round(counters.get(f"route.{tier}.ms", 0) / requests) if requests else None,
+            "p50Ms": _percentile(counters, tier, requests, 0.5) if requests else None,
+            "p95Ms": _percentile(counters, tier, requests, 0.95) if requests else None
+        }
+    stats["directFallbacks"] = counters.get("route.direct_fallbacks", 0)
+    return stats
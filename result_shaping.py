@@ -0,0 +1,221 @@
+"""
+Size-aware shaping of tool results before they are handed to Claude.
+
+Large n8n payloads (execution lists, execution run data) are projected down to
+the fields Claude needs. Anything that is dropped stays available by reference
+through the get_full_result proxy tool. Workflows are sent back to n8n through
+n8n_update_full_workflow, so their projection keeps every writable field as is.
+"""
+
+import json
+from collections import OrderedDict
+
+import proxy_log as log
+import tool_content as types
+
+
+FULL_RESULT_TOOL_NAME = "get_full_result"
+
+# Number of array items kept when truncating execution data
+MAX_ARRAY_ITEMS = 20
+# More aggressive limits applied when a result is still over the byte budget
+MIN_ARRAY_ITEMS = 3
+MAX_STRING_CHARS = 2000
+
+# Fields kept per execution in n8n_list_executions
+EXECUTION_SUMMARY_FIELDS = {
+    'id', 'workflowId', 'status', 'mode', 'finished', 'startedAt', 'stoppedAt',
+    'waitTill', 'retryOf', 'retrySuccessId'
+}
+
+# Top-level workflow fields kept in n8n_get_workflow (drops shared, meta, ...)
+WORKFLOW_FIELDS = {
+    'id', 'name', 'active', 'nodes', 'connections', 'settings', 'staticData', 'pinData', 'tags',
+    'createdAt', 'updatedAt', 'versionId'
+}
+
+# Results Claude edits and writes back: never truncated field by field, only cut as a whole
+ROUND_TRIP_TOOLS = {'n8n_get_workflow', 'n8n_get_workflow_details'}
+
+
+def drop_nulls(value):
+    """Recursively remove dict entries whose value is None."""
+    if isinstance(value, dict):
+        return {key: drop_nulls(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [drop_nulls(item) for item in value]
+    return value
+
+
+def utf8_prefix(text: str, max_bytes: int) -> str:
+    """Longest prefix of text, cut on a character boundary, that is at most max_bytes in UTF-8."""
+    return text[:max_bytes].encode()[:max_bytes].decode(errors="ignore")
+
+
+def truncate_arrays(value, max_items: int, max_chars: int | None = None):
+    """Truncate long arrays (and optionally strings), leaving a summary marker."""
+    if isinstance(value, dict):
+        return {key: truncate_arrays(item, max_items, max_chars) for key, item in value.items()}
+    if isinstance(value, list):
+        kept = [truncate_arrays(item, max_items, max_chars) for item in value[:max_items]]
+        if len(value) > max_items:
+            kept.append({"_truncated": f"{len(value) - max_items} more of {len(value)} items omitted"})
+        return kept
+    if max_chars is not None and isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + f"... [{len(value) - max_chars} more characters omitted]"
+    return value
+
+
+def _project_list_executions(data: dict) -> dict:
+    executions = data.get("executions")
+    if not isinstance(executions, list):
+        return data
+    return drop_nulls({
+        **data,
+        "executions": [
+            {key: value for key, value in execution.items() if key in EXECUTION_SUMMARY_FIELDS}
+            if isinstance(execution, dict) else execution
+            for execution in executions
+        ]
+    })
+
+
+def _project_get_execution(data: dict) -> dict:
+    return drop_nulls(truncate_arrays(data, MAX_ARRAY_ITEMS))
+
+
+def _project_get_workflow(data: dict) -> dict:
+    return {key: value for key, value in data.items() if key in WORKFLOW_FIELDS}
+
+
+# Per-tool projections of the `data` field of a {success, data} result
+PROJECTIONS = {
+    'n8n_list_executions': _project_list_executions,
+    'n8n_get_execution': _project_get_execution,
+    'n8n_get_workflow': _project_get_workflow,
+}
+
+
+class ResultShaper:
+    """Project, budget and track the size of tool results."""
+
+    def __init__(self, byte_budget: int = 65536, max_stored: int = 16):
+        self.byte_budget = byte_budget
+        self.max_stored = max_stored
+        self._full_results: OrderedDict[str, str] = OrderedDict()
+        self._next_ref = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def shape(self, tool_name: str, content: list[types.TextContent]) -> list[types.TextContent]:
+        """Shape each text item of a tool result."""
+        return [
+            types.TextContent(type="text", text=self._shape_text(tool_name, item.text))
+            for item in content
+        ]
+
+    def _shape_text(self, tool_name: str, text: str) -> str:
+        size_in = len(text.encode())
+        self.bytes_in += size_in
+
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError:
+            payload = None
+
+        shaped_payload = None
+        shaped = text
+        lossy = False
+        if isinstance(payload, dict):
+            shaped_payload = payload
+            projection = PROJECTIONS.get(tool_name)
+            if projection and isinstance(payload.get("data"), dict):
+                shaped_payload = {**payload, "data": projection(payload["data"])}
+            shaped = json.dumps(shaped_payload)
+            if len(shaped.encode()) > self.byte_budget and tool_name not in ROUND_TRIP_TOOLS:
+                shaped_payload = truncate_arrays(shaped_payload, MIN_ARRAY_ITEMS, MAX_STRING_CHARS)
+                shaped = json.dumps(shaped_payload)
+            lossy = shaped_payload != payload
+
+        if len(shaped.encode()) > self.byte_budget:
+            # Still too large: cut the text and let Claude page through the full payload
+            shaped = utf8_prefix(shaped, self.byte_budget)
+            shaped_payload = None
+            lossy = True
+
+        if lossy:
+            ref = self._store(text)
+            note = {
+                "ref": ref,
+                "originalBytes": size_in,
+                "hint": f"Result was shortened. Call {FULL_RESULT_TOOL_NAME}({{ref: '{ref}'}}) for the complete payload."
+            }
+            if shaped_payload is not None:
+                shaped = json.dumps({**shaped_payload, "_shaped": note})
+            else:
+                shaped += "\n... [result truncated] " + json.dumps({"_shaped": note})
+
+        size_out = len(shaped.encode())
+        self.bytes_out += size_out
+        if size_out < size_in:
+            log.debug("result.shaped", tool=tool_name, bytesIn=size_in, bytesOut=size_out)
+        return shaped
+
+    def _store(self, text: str) -> str:
+        """Keep a full payload for later retrieval by reference."""
+        self._next_ref += 1
+        ref = f"r{self._next_ref}"
+        self._full_results[ref] = text
+        while len(self._full_results) > self.max_stored:
+            self._full_results.popitem(last=False)
+        return ref
+
+    def tool(self) -> types.Tool:
+        """Describe the proxy-level tool that fetches full payloads by reference."""
+        return types.Tool(
+            name=FULL_RESULT_TOOL_NAME,
+            description=(
+                "Fetch the complete payload of a tool result that was shortened. Pass the `ref` from "
+                "the result's `_shaped` field. Large payloads are returned in pages; pass `offset` "
+                "(from `nextOffset`) to continue. Shortened workflows must be fetched in full before "
+                "being sent back with n8n_update_full_workflow."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "ref": {"type": "string", "description": "Reference from the `_shaped` field"},
+                    "offset": {"type": "integer", "description": "Character offset to start from (default 0)"}
+                },
+                "required": ["ref"]
+            }
+        )
+
+    def full_result(self, arguments: dict) -> list[types.TextContent]:
+        """Return one page of a stored full payload."""
+        text = self._full_results.get(arguments.get("ref"))
+        if text is None:
+            return [types.TextContent(
+                type="text",
+                text=json.dumps({"success": False, "error": f"Unknown or expired ref {arguments.get('ref')}"})
+            )]
+        try:
+            offset = max(0, int(arguments.get("offset") or 0))
+        except (TypeError, ValueError):
+            return [types.TextContent(
+                type="text",
+                text=json.dumps({"success": False, "error": f"offset must be an integer, got {arguments.get('offset')!r}"})
+            )]
+        # Pages are cut on character boundaries so no character is split between two pages
+        page = utf8_prefix(text[offset:], self.byte_budget)
+        next_offset = offset + len(page)
+        self.bytes_out += len(page.encode())
+        return [types.TextContent(
+            type="text",
+            text=json.dumps({
+                "success": True,
+                "totalChars": len(text),
+                "offset": offset,
+                "nextOffset": next_offset if next_offset < len(text) else None,
+                "content": page
+            })
+        )]
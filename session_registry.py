@@ -0,0 +1,143 @@
+"""
+Registry of Claude sessions used with --resume.
+
+Tracks turn count, transcript size, last use and owning worker per session so
+that oversized sessions can be rolled over and stale transcripts removed.
+"""
+
+import os
+import socket
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Tuple
+
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker, Session
+
+import shared_state
+
+DB_PATH = Path(__file__).parent / "sessions.db"
+CLAUDE_PROJECTS_DIR = Path.home() / ".claude" / "projects"
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Characters of the last answer carried over when a session is rolled over
+ROLLOVER_CONTEXT_CHARS = 2000
+
+Base = declarative_base()
+
+
+class ChatSession(Base):
+    __tablename__ = 'chat_sessions'
+
+    session_id = Column(String, primary_key=True)
+    turn_count = Column(Integer, default=0, nullable=False)
+    transcript_bytes = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+    worker = Column(String, nullable=True)
+    last_result = Column(Text, nullable=True)
+    rolled_over_from = Column(String, nullable=True)
+
+
+_engine = None
+
+
+def get_engine():
+    """Get SQLAlchemy engine."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(f"sqlite:///{DB_PATH}")
+    return _engine
+
+
+def get_session() -> Session:
+    """Get SQLAlchemy session."""
+    SessionLocal = sessionmaker(bind=get_engine())
+    return SessionLocal()
+
+
+def init_db():
+    """Initialize the database with the chat_sessions table."""
+    Base.metadata.create_all(get_engine())
+
+
+def find_transcript(session_id: str) -> Optional[Path]:
+    """Locate the transcript Claude CLI keeps for a session."""
+    if not CLAUDE_PROJECTS_DIR.exists():
+        return None
+    for path in CLAUDE_PROJECTS_DIR.glob(f"*/{session_id}.jsonl"):
+        return path
+    return None
+
+
+def resolve_resume(session_id: str, rollover_bytes: int) -> Tuple[Optional[str], Optional[str]]:
+    """Decide how to continue a session.
+
+    Returns the session ID to pass to --resume, or None with a short context
+    string when the session has grown past rollover_bytes and a fresh session
+    should be started instead.
+    """
+    with get_session() as session:
+        chat_session = session.get(ChatSession, session_id)
+        if chat_session is not None:
+            # Whether the session comes back to the worker that ran it last (only counted, not routed)
+            same_worker = chat_session.worker == WORKER_ID
+            shared_state.counter_add("session.affinity_hits" if same_worker else "session.affinity_misses")
+        if chat_session is None or chat_session.transcript_bytes <= rollover_bytes:
+            return session_id, None
+
+        context = "This continues an earlier conversation that grew too long to resume."
+        if chat_session.last_result:
+            context += f" Your last answer was:\n{chat_session.last_result[:ROLLOVER_CONTEXT_CHARS]}"
+        return None, context
+
+
+def record_turn(session_id: str, previous_session_id: Optional[str], last_result: str, rolled_over: bool = False) -> None:
+    """Record a completed turn against the session Claude reported."""
+    transcript = find_transcript(session_id)
+    transcript_bytes = transcript.stat().st_size if transcript else 0
+
+    with get_session() as session:
+        chat_session = session.get(ChatSession, session_id)
+        if chat_session is None:
+            previous = session.get(ChatSession, previous_session_id) if previous_session_id else None
+            chat_session = ChatSession(
+                session_id=session_id,
+                # A resumed session may come back under a new ID; carry its turn count over
+                turn_count=previous.turn_count if previous and not rolled_over else 0,
+                rolled_over_from=previous_session_id if rolled_over else None
+            )
+            session.add(chat_session)
+        chat_session.turn_count += 1
+        chat_session.transcript_bytes = transcript_bytes
+        chat_session.last_used_at = datetime.utcnow()
+        chat_session.worker = WORKER_ID
+        chat_session.last_result = last_result[:ROLLOVER_CONTEXT_CHARS]
+        session.commit()
+
+
+def affinity_stats() -> dict:
+    """How often a resumed session landed on the worker that ran its previous turn, across all workers."""
+    counters = shared_state.counters("session.")
+    hits = counters.get("session.affinity_hits", 0)
+    misses = counters.get("session.affinity_misses", 0)
+    return {
+        "sameWorker": hits,
+        "otherWorker": misses,
+        "sameWorkerRate": round(hits / (hits + misses), 3) if hits + misses else None
+    }
+
+
+def garbage_collect(max_age_days: int) -> int:
+    """Delete sessions (and their transcripts) not used for max_age_days."""
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    with get_session() as session:
+        stale = session.query(ChatSession).filter(ChatSession.last_used_at < cutoff).all()
+        for chat_session in stale:
+            transcript = find_transcript(chat_session.session_id)
+            if transcript:
+                transcript.unlink(missing_ok=True)
+            session.delete(chat_session)
+        session.commit()
+        return len(stale)
@@ -0,0 +1,198 @@
+"""
+Local state broker shared by all worker processes.
+
+A SQLite database in WAL mode holds the state that must be consistent across
+uvicorn workers and MCP proxies on one host: admission-control slots for Claude
+runs, TTL caches (rephrased todos, validation results, workflow snapshots,
+per-session credential hashes), rate-limit windows and counters. Every
+operation is a short transaction, so workers never hold the database for long.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "shared_state.db"
+
+# Slots not released within this time are considered leaked
+SLOT_MAX_AGE_SECONDS = 3600
+
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    """Get this thread's connection, creating the schema on first use."""
+    # Connections must not be shared across threads or a fork
+    if getattr(_local, "connection", None) is None or _local.pid != os.getpid():
+        connection = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS shared_cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS run_slots ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, pid INTEGER NOT NULL, acquired_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        _local.connection = connection
+        _local.pid = os.getpid()
+    return _local.connection
+
+
+def cache_get(namespace: str, key: str):
+    """Return a cached JSON value, or None if missing or expired."""
+    row = _connect().execute(
+        "SELECT value, expires_at FROM shared_cache WHERE namespace = ? AND key = ?",
+        (namespace, key)
+    ).fetchone()
+    if row is None:
+        return None
+    value, expires_at = row
+    if expires_at is not None and expires_at < time.time():
+        return None
+    return json.loads(value)
+
+
+def cache_set(namespace: str, key: str, value, ttl_seconds: float | None = None) -> None:
+    """Store a JSON value, optionally expiring after ttl_seconds."""
+    expires_at = time.time() + ttl_seconds if ttl_seconds else None
+    _connect().execute(
+        "INSERT OR REPLACE INTO shared_cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+        (namespace, key, json.dumps(value), expires_at)
+    )
+
+
+def cache_swap(namespace: str, key: str, value, ttl_seconds: float | None = None):
+    """Atomically store a JSON value and return the one it replaced (None if missing or expired)."""
+    connection = _connect()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        now = time.time()
+        row = connection.execute(
+            "SELECT value, expires_at FROM shared_cache WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        previous = json.loads(row[0]) if row and (row[1] is None or row[1] >= now) else None
+        connection.execute(
+            "INSERT OR REPLACE INTO shared_cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), now + ttl_seconds if ttl_seconds else None)
+        )
+        connection.execute("COMMIT")
+        return previous
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def cache_delete(namespace: str, key: str) -> None:
+    """Delete one cache entry."""
+    _connect().execute("DELETE FROM shared_cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+
+def cache_delete_prefix(namespace: str, prefix: str) -> None:
+    """Delete every cache entry whose key starts with prefix."""
+    _connect().execute(
+        "DELETE FROM shared_cache WHERE namespace = ? AND substr(key, 1, ?) = ?",
+        (namespace, len(prefix), prefix)
+    )
+
+
+def cache_purge_expired() -> int:
+    """Delete expired cache entries."""
+    cursor = _connect().execute(
+        "DELETE FROM shared_cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+    )
+    return cursor.rowcount
+
+
+def counter_add(name: str, amount: int = 1) -> None:
+    """Atomically add to a named counter."""
+    _connect().execute(
+        "INSERT INTO counters (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, amount)
+    )
+
+
+def counters(prefix: str = "") -> dict[str, int]:
+    """Read all counters whose name starts with prefix."""
+    rows = _connect().execute(
+        "SELECT name, value FROM counters WHERE substr(name, 1, ?) = ?", (len(prefix), prefix)
+    ).fetchall()
+    return dict(rows)
+
+
+def rate_limit(key: str, limit: int, window_seconds: float) -> float | None:
+    """Count one event against a sliding-window limit; return seconds to wait if it is over."""
+    connection = _connect()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        now = time.time()
+        row = connection.execute(
+            "SELECT value FROM shared_cache WHERE namespace = 'rate' AND key = ?", (key,)
+        ).fetchone()
+        recent = [at for at in (json.loads(row[0]) if row else []) if at > now - window_seconds]
+        if len(recent) >= limit:
+            connection.execute("COMMIT")
+            return recent[0] + window_seconds - now
+        recent.append(now)
+        connection.execute(
+            "INSERT OR REPLACE INTO shared_cache (namespace, key, value, expires_at) VALUES ('rate', ?, ?, ?)",
+            (key, json.dumps(recent), now + window_seconds)
+        )
+        connection.execute("COMMIT")
+        return None
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def acquire_run_slot(max_slots: int) -> int | None:
+    """Take one of max_slots Claude run slots across all workers; None if all are taken."""
+    connection = _connect()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        # Reclaim slots leaked by crashed workers
+        for slot_id, pid, acquired_at in connection.execute("SELECT id, pid, acquired_at FROM run_slots").fetchall():
+            if not _pid_alive(pid) or time.time() - acquired_at > SLOT_MAX_AGE_SECONDS:
+                connection.execute("DELETE FROM run_slots WHERE id = ?", (slot_id,))
+        (in_use,) = connection.execute("SELECT COUNT(*) FROM run_slots").fetchone()
+        if in_use >= max_slots:
+            connection.execute("COMMIT")
+            return None
+        cursor = connection.execute(
+            "INSERT INTO run_slots (pid, acquired_at) VALUES (?, ?)", (os.getpid(), time.time())
+        )
+        connection.execute("COMMIT")
+        return cursor.lastrowid
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def release_run_slot(slot_id: int) -> None:
+    """Give a run slot back."""
+    _connect().execute("DELETE FROM run_slots WHERE id = ?", (slot_id,))
+
+
+def run_slots_in_use() -> int:
+    """Number of Claude runs currently admitted across all workers."""
+    (in_use,) = _connect().execute("SELECT COUNT(*) FROM run_slots").fetchone()
+    return in_use
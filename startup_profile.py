@@ -0,0 +1,85 @@
+"""
+Start-up profiling for main.py and mcp_proxy.py (--profile-startup).
+"""
+
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+base_dir = Path(__file__).parent
+
+
+def import_times(module: str) -> tuple[float, list[tuple[str, float]]]:
+    """Import a module in a fresh interpreter and return (total ms, [(direct import, ms)])."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=base_dir, capture_output=True, text=True
+    )
+    total = 0.0
+    direct = []
+    # Children are listed before their parent, so collect depth-1 entries until the module itself
+    children = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        milliseconds = int(cumulative) / 1000
+        if depth == 1:
+            children.append((name.strip(), milliseconds))
+        elif depth == 0:
+            if name.strip() == module:
+                total = milliseconds
+                direct = children
+            children = []
+    direct.sort(key=lambda item: item[1], reverse=True)
+    return total, direct
+
+
+def print_import_times(module: str, top: int = 15) -> None:
+    """Print the slowest direct imports of a module."""
+    total, direct = import_times(module)
+    print(f"import {module}: {total:.1f} ms", file=sys.stderr)
+    for name, milliseconds in direct[:top]:
+        print(f"  {name:<40} {milliseconds:8.1f} ms", file=sys.stderr)
+
+
+def proxy_cold_start() -> dict:
+    """Spawn the proxy and time its answers to initialize and tools/list."""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(base_dir / "mcp_proxy.py")],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=base_dir
+    )
+    timings = {}
+    try:
+        for request_id, method, params in [
+            (1, "initialize", {"protocolVersion": "2024-11-05", "capabilities": {}, "clientInfo": {"name": "profile", "version": "0"}}),
+            (2, "tools/list", {})
+        ]:
+            process.stdin.write((json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}) + "\n").encode())
+            process.stdin.flush()
+            process.stdout.readline()
+            timings[method] = (time.perf_counter() - started) * 1000
+            if method == "initialize":
+                initialized = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+                process.stdin.write((json.dumps(initialized) + "\n").encode())
+                process.stdin.flush()
+    finally:
+        process.stdin.close()
+        process.wait(timeout=10)
+    return timings
+
+
+def profile_proxy_startup() -> None:
+    """Report proxy import times and cold-start latency."""
+    print_import_times("mcp_proxy")
+    for method, milliseconds in proxy_cold_start().items():
+        print(f"{method} answered after {milliseconds:.1f} ms", file=sys.stderr)
+
+
+def profile_main_startup() -> None:
+    """Report main.py import times."""
+    print_import_times("main")
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+import mcp_calling
+import shared_state
+from call_policy import CallPolicies, CircuitBreakers
+from mcp_calling import DirectMCPClient
+from tool_content import TextContent
+
+shared_state.DB_PATH = Path(tempfile.mkdtemp()) / "shared_state.db"
+
+NODE_CONFIG = {"nodeType": "nodes-base.slack", "config": {"resource": "message"}}
+
+
+def client_with_backend(request_tool, policies: dict | None = None) -> DirectMCPClient:
+    """A client whose backend requests are answered by `request_tool` instead of node."""
+    client = DirectMCPClient()
+    client.call_policies = CallPolicies(client.n8n_management_tools, policies)
+    client._request_tool = request_tool
+    return client
+
+
+def test_timed_out_validation_is_not_cached():
+    calls = []
+
+    async def hang(tool_name, arguments):
+        calls.append(tool_name)
+        await asyncio.sleep(60)
+
+    async def answer(tool_name, arguments):
+        calls.append(tool_name)
+        return [TextContent(type="text", text=json.dumps({"valid": True, "errors": []}))]
+
+    async def run():
+        fast_timeout = {"validate_node_minimal": {"timeout_seconds": 0.05, "max_attempts": 1}}
+        first = client_with_backend(hang, fast_timeout)
+        timed_out = await first.call_tool("validate_node_minimal", dict(NODE_CONFIG))
+        assert json.loads(timed_out[0].text)["errorType"] == "timeout"
+
+        second = client_with_backend(answer)
+        result = await second.call_tool("validate_node_minimal", dict(NODE_CONFIG))
+        assert json.loads(result[0].text)["valid"] is True
+        assert second.validation_cache.hits == 0
+        assert calls == ["validate_node_minimal", "validate_node_minimal"]
+
+        # A real answer is cached for later proxies
+        third = client_with_backend(answer)
+        await third.call_tool("validate_node_minimal", dict(NODE_CONFIG))
+        assert third.validation_cache.hits == 1
+        assert len(calls) == 2
+
+    asyncio.run(run())
+
+
+def test_circuit_counts_failed_calls_not_attempts():
+    attempts = []
+
+    async def connection_reset(tool_name, arguments):
+        attempts.append(tool_name)
+        return [TextContent(type="text", text=json.dumps({"success": False, "error": "read ECONNRESET"}))]
+
+    async def run():
+        client = client_with_backend(connection_reset, {"n8n_list_workflows": {"max_attempts": 3}})
+        client.circuit_breakers = CircuitBreakers(failure_threshold=3, reset_seconds=60)
+        arguments = {"apiUrl": "https://circuit.example/", "apiKey": "k"}
+        for _ in range(2):
+            await client.call_tool("n8n_list_workflows", dict(arguments))
+        assert len(attempts) == 6
+        assert client.circuit_breakers.retry_after("https://circuit.example/") is None
+
+        await client.call_tool("n8n_list_workflows", dict(arguments))
+        rejected = await client.call_tool("n8n_list_workflows", dict(arguments))
+        assert json.loads(rejected[0].text)["errorType"] == "circuit_open"
+        assert len(attempts) == 9
+
+    original_delay = mcp_calling.retry_delay
+    mcp_calling.retry_delay = lambda attempt: 0
+    try:
+        asyncio.run(run())
+    finally:
+        mcp_calling.retry_delay = original_delay
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,47 @@
+from request_router import TIER_DIRECT, TIER_FULL, TIER_LIGHT, classify, classify_with_model
+
+
+def tier(message: str):
+    route = classify(message)
+    return route.tier if route else None
+
+
+def test_follow_ups_go_to_the_full_agent():
+    for message in ("do it", "Do that please", "yes", "Yes, go ahead", "continue", "ok", "try again", "sounds good"):
+        assert tier(message) == TIER_FULL, message
+
+
+def test_health_check_is_only_about_the_instance():
+    assert tier("Is my n8n instance up?") == TIER_DIRECT
+    assert tier("is n8n working") == TIER_DIRECT
+    assert tier("Is my Gmail connection working?") != TIER_DIRECT
+    assert tier("Is the api node ok?") != TIER_DIRECT
+
+
+def test_diagnostic_questions_are_not_answered_with_a_list():
+    assert tier("show me what went wrong in the last execution") == TIER_FULL
+    assert tier("What failed in my latest run?") == TIER_FULL
+    assert tier("show me recent executions") == TIER_DIRECT
+
+
+def test_simple_reads_and_questions():
+    assert tier("list my workflows") == TIER_DIRECT
+    assert tier("What does the Merge node do?") == TIER_LIGHT
+    assert tier("Do executions get stored?") == TIER_LIGHT
+    assert tier("Add a Slack node") == TIER_FULL
+    assert tier("yesterday's executions") != TIER_FULL
+
+
+def test_router_model_errors_go_to_the_full_agent():
+    def missing_api_key():
+        raise RuntimeError("The api_key client option must be set")
+
+    route = classify_with_model(missing_api_key, "gpt-4o-mini", "hmm, my thing")
+    assert (route.tier, route.reason) == (TIER_FULL, "model:error")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
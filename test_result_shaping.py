@@ -0,0 +1,64 @@
+import json
+
+from result_shaping import FULL_RESULT_TOOL_NAME, ResultShaper
+from tool_content import TextContent
+
+BUDGET = 4096
+
+
+def big_workflow() -> dict:
+    nodes = [
+        {"id": str(i), "name": f"Set {i}", "type": "n8n-nodes-base.set",
+         "parameters": {"values": [{"name": f"field{j}", "value": "x" * 50} for j in range(10)]}}
+        for i in range(20)
+    ]
+    return {"id": "w1", "name": "Big", "nodes": nodes, "connections": {}, "settings": {}, "pinData": {}, "staticData": None}
+
+
+def shape(shaper: ResultShaper, tool_name: str, payload: dict) -> str:
+    return shaper.shape(tool_name, [TextContent(type="text", text=json.dumps(payload))])[0].text
+
+
+def full_text(shaper: ResultShaper, shaped: str) -> str:
+    ref = json.loads(shaped.rsplit("... [result truncated] ", 1)[1])["_shaped"]["ref"]
+    pages, offset = [], 0
+    while offset is not None:
+        page = json.loads(shaper.full_result({"ref": ref, "offset": offset})[0].text)
+        pages.append(page["content"])
+        offset = page.get("nextOffset")
+    return "".join(pages)
+
+
+def test_workflows_are_never_truncated_inside_nodes():
+    for tool_name, payload in (
+        ("n8n_get_workflow", {"success": True, "data": big_workflow()}),
+        ("n8n_get_workflow_details", {"success": True, "data": {"workflow": big_workflow(), "hasWebhookTrigger": False}})
+    ):
+        shaper = ResultShaper(byte_budget=BUDGET)
+        shaped = shape(shaper, tool_name, payload)
+        assert "_truncated" not in shaped, tool_name
+        assert "more characters omitted" not in shaped, tool_name
+        assert "[result truncated]" in shaped and FULL_RESULT_TOOL_NAME in shaped, tool_name
+        assert json.loads(full_text(shaper, shaped)) == payload, tool_name
+
+
+def test_workflow_keeps_writable_fields():
+    shaper = ResultShaper(byte_budget=1_000_000)
+    data = json.loads(shape(shaper, "n8n_get_workflow", {"success": True, "data": {**big_workflow(), "shared": [{}]}}))["data"]
+    assert "shared" not in data
+    assert data["pinData"] == {} and "staticData" in data and data["staticData"] is None
+
+
+def test_executions_are_truncated_field_by_field():
+    shaper = ResultShaper(byte_budget=4 * BUDGET)
+    execution = {"id": "1", "data": {"resultData": {"runData": {"Set": [{"data": "y" * 5000}] * 30}}}}
+    shaped = json.loads(shape(shaper, "n8n_get_execution", {"success": True, "data": execution}))
+    assert "_shaped" in shaped
+    assert len(shaped["data"]["data"]["resultData"]["runData"]["Set"]) == 4
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,31 @@
+import tempfile
+from pathlib import Path
+
+import session_registry
+import shared_state
+
+temp_dir = Path(tempfile.mkdtemp())
+shared_state.DB_PATH = temp_dir / "shared_state.db"
+session_registry.DB_PATH = temp_dir / "sessions.db"
+session_registry.init_db()
+
+
+def test_resumed_sessions_count_worker_affinity():
+    session_registry.record_turn("s1", None, "Added workflow")
+    assert session_registry.resolve_resume("s1", 10_000_000) == ("s1", None)
+
+    with session_registry.get_session() as session:
+        session.get(session_registry.ChatSession, "s1").worker = "other-host:1"
+        session.commit()
+    session_registry.resolve_resume("s1", 10_000_000)
+    # Unknown sessions are not counted
+    session_registry.resolve_resume("new", 10_000_000)
+
+    assert session_registry.affinity_stats() == {"sameWorker": 1, "otherWorker": 1, "sameWorkerRate": 0.5}
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,44 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import usage_store
+from usage_store import RunUsage, UsageTurn, openai_price
+
+usage_store.DB_PATH = Path(tempfile.mkdtemp()) / "auth_tokens.db"
+
+
+def test_models_and_snapshots_are_priced():
+    assert openai_price("gpt-4o") == (2.50, 10.00)
+    assert openai_price("gpt-4o-mini") == (0.15, 0.60)
+    assert openai_price("gpt-4o-mini-2024-07-18") == (0.15, 0.60)
+    assert openai_price("gpt-4o-2024-08-06") == (2.50, 10.00)
+    assert openai_price("gpt-5") is None
+
+
+def test_router_model_usage_counts_its_cost():
+    usage = RunUsage()
+    usage.add_openai("gpt-4o-mini", SimpleNamespace(prompt_tokens=1_000_000, completion_tokens=1_000_000))
+    assert usage.openai_input_tokens == 1_000_000
+    assert round(usage.openai_cost_usd, 6) == 0.75
+
+
+def test_runs_record_the_request_id_feedback_refers_to():
+    # A usage_turns table from before request_id was recorded
+    usage_store.init_db()
+    with sqlite3.connect(usage_store.DB_PATH) as connection:
+        connection.execute("DROP INDEX ix_usage_turns_request_id")
+        connection.execute("ALTER TABLE usage_turns DROP COLUMN request_id")
+    usage_store.init_db()
+    usage_store.record_run(1, RunUsage(session_id="s1", request_id="key-1", tool_calls=2))
+    with usage_store.get_session() as session:
+        turn = session.query(UsageTurn).filter(UsageTurn.request_id == "key-1").one()
+    assert (turn.session_id, turn.tool_calls) == ("s1", 2)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,40 @@
+import tempfile
+from pathlib import Path
+
+import shared_state
+from workflow_cache import WorkflowCache, mark_prefetched
+
+shared_state.DB_PATH = Path(tempfile.mkdtemp()) / "shared_state.db"
+
+API_URL = "https://x.app.n8n.cloud/"
+WORKFLOW = {"id": "w1", "name": "Notify", "nodes": [], "connections": {}, "updatedAt": "2026-01-01T00:00:00.000Z"}
+
+
+def test_prefetched_snapshot_is_served_fresh_by_other_proxies():
+    WorkflowCache().store(API_URL, "k", WORKFLOW)
+    mark_prefetched(API_URL, "k", "w1", 30)
+    other = WorkflowCache()
+    snapshot = other.get(API_URL, "k", "w1")
+    assert snapshot.prefetched and other.is_fresh(snapshot)
+    assert WorkflowCache().get(API_URL, "other key", "w1") is None
+
+
+def test_invalidate_drops_snapshots_and_prefetch_markers():
+    writer = WorkflowCache()
+    writer.store(API_URL, "k", WORKFLOW)
+    mark_prefetched(API_URL, "k", "w1", 30)
+    writer.invalidate(API_URL, "w1")
+    assert WorkflowCache().get(API_URL, "k", "w1") is None
+
+    # Stored again by a plain read after the write: must be revalidated before use
+    WorkflowCache().store(API_URL, "k", {**WORKFLOW, "updatedAt": "2026-01-02T00:00:00.000Z"})
+    reader = WorkflowCache()
+    snapshot = reader.get(API_URL, "k", "w1")
+    assert not snapshot.prefetched and not reader.is_fresh(snapshot)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
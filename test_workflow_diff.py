@@ -0,0 +1,93 @@
+import copy
+
+from workflow_diff import MAX_DIFF_OPERATIONS, diff_workflow
+
+TRIGGER = {"id": "1", "name": "Trigger", "type": "n8n-nodes-base.manualTrigger", "parameters": {}}
+SEND = {"id": "2", "name": "Send", "type": "n8n-nodes-base.slack", "parameters": {"text": "hi"}}
+CURRENT = {
+    "name": "Notify",
+    "nodes": [TRIGGER, SEND],
+    "connections": {"Trigger": {"main": [[{"node": "Send", "type": "main", "index": 0}]]}},
+    "settings": {"executionOrder": "v1"}
+}
+
+
+def update_of(workflow: dict, **changes) -> dict:
+    update = {"id": "w1", **copy.deepcopy({k: workflow[k] for k in ("nodes", "connections")})}
+    update.update(changes)
+    return update
+
+
+def test_parameter_change_is_one_update_node():
+    send = {**SEND, "parameters": {"text": "hello"}}
+    operations = diff_workflow(CURRENT, update_of(CURRENT, nodes=[TRIGGER, send]))
+    assert operations == [{"type": "updateNode", "nodeId": "2", "changes": {"parameters": {"text": "hello"}}}]
+
+
+def test_unchanged_workflow_has_no_diff():
+    assert diff_workflow(CURRENT, update_of(CURRENT)) is None
+
+
+def test_added_node_and_connection():
+    log = {"id": "3", "name": "Log", "type": "n8n-nodes-base.noOp", "parameters": {}}
+    connections = copy.deepcopy(CURRENT["connections"])
+    connections["Send"] = {"main": [[{"node": "Log", "type": "main", "index": 0}]]}
+    operations = diff_workflow(CURRENT, update_of(CURRENT, nodes=[TRIGGER, SEND, log], connections=connections))
+    assert operations == [
+        {"type": "addNode", "node": log},
+        {"type": "addConnection", "source": "Send", "target": "Log", "sourceOutput": "main",
+         "targetInput": "main", "sourceIndex": 0, "targetIndex": 0}
+    ]
+
+
+def test_removed_connection():
+    operations = diff_workflow(CURRENT, update_of(CURRENT, connections={}))
+    assert operations == [
+        {"type": "removeConnection", "source": "Trigger", "target": "Send", "sourceOutput": "main", "targetInput": "main"}
+    ]
+
+
+def test_node_replaced_under_the_same_name_keeps_its_connections():
+    replacement = {**SEND, "id": "3"}
+    operations = diff_workflow(CURRENT, update_of(CURRENT, nodes=[TRIGGER, replacement]))
+    assert operations == [
+        {"type": "removeNode", "nodeId": "2"},
+        {"type": "addNode", "node": replacement},
+        {"type": "addConnection", "source": "Trigger", "target": "Send", "sourceOutput": "main",
+         "targetInput": "main", "sourceIndex": 0, "targetIndex": 0}
+    ]
+
+
+def test_removed_node_drops_its_connections_implicitly():
+    operations = diff_workflow(CURRENT, update_of(CURRENT, nodes=[TRIGGER], connections={}))
+    assert operations == [{"type": "removeNode", "nodeId": "2"}]
+
+
+def test_ambiguous_changes_fall_back_to_the_full_update():
+    renamed = {**SEND, "name": "Post"}
+    assert diff_workflow(CURRENT, update_of(CURRENT, nodes=[TRIGGER, renamed])) is None
+    without_parameters = {k: v for k, v in SEND.items() if k != "parameters"}
+    assert diff_workflow(CURRENT, update_of(CURRENT, nodes=[TRIGGER, without_parameters])) is None
+    assert diff_workflow(CURRENT, update_of(CURRENT, staticData={})) is None
+    duplicate_ids = [TRIGGER, {**SEND, "id": "1"}]
+    assert diff_workflow(CURRENT, update_of(CURRENT, nodes=duplicate_ids)) is None
+
+
+def test_too_many_operations_fall_back_to_the_full_update():
+    extra = [{"id": f"n{i}", "name": f"Node {i}", "type": "n8n-nodes-base.noOp"} for i in range(MAX_DIFF_OPERATIONS + 1)]
+    assert diff_workflow(CURRENT, update_of(CURRENT, nodes=[TRIGGER, SEND, *extra])) is None
+
+
+def test_settings_and_name():
+    operations = diff_workflow(CURRENT, update_of(CURRENT, name="Alert", settings={"executionOrder": "v1", "timezone": "UTC"}))
+    assert operations == [
+        {"type": "updateSettings", "settings": {"executionOrder": "v1", "timezone": "UTC"}},
+        {"type": "updateName", "name": "Alert"}
+    ]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
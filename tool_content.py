@@ -0,0 +1,28 @@
+"""
+Lightweight MCP tool and content records used by the proxy.
+
+Importing mcp.types pulls in the whole MCP SDK, which dominated proxy start-up.
+These mirror the fields of mcp.types.Tool and mcp.types.TextContent that the
+proxy uses and serialise to the same JSON.
+"""
+
+from dataclasses import dataclass, field
+
+
+@dataclass
+class TextContent:
+    text: str
+    type: str = "text"
+
+    def to_dict(self) -> dict:
+        return {"type": self.type, "text": self.text}
+
+
+@dataclass
+class Tool:
+    name: str
+    description: str = ""
+    inputSchema: dict = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "description": self.description, "inputSchema": self.inputSchema}
@@ -0,0 +1,286 @@
+"""
+Usage and cost accounting per auth token.
+
+Every Claude run records one UsageTurn row (tokens, cost, wall time and tool
+calls, including the OpenAI calls made to rephrase todo items) and adds the
+same numbers to a per-token, per-day UsageDaily rollup in the same transaction.
+Budget checks and reports only read the rollups, never the turn rows.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import create_engine, event, func, Column, Date, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import sessionmaker, Session
+
+import shared_state
+from auth_cli import AuthToken, Base, DB_PATH
+
+# USD per million input and output tokens of the OpenAI models main.py and ROUTER_MODEL can use;
+# a model missing here would not count against the token budgets, so the server refuses to start with it
+OPENAI_PRICES_PER_MTOK = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-3.5-turbo": (0.50, 1.50)
+}
+
+# Columns summed into UsageDaily
+ROLLUP_FIELDS = (
+    'input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_creation_tokens', 'cost_usd',
+    'openai_input_tokens', 'openai_output_tokens', 'openai_cost_usd', 'wall_seconds', 'tool_calls'
+)
+
+
+def openai_price(model: str) -> Optional[tuple[float, float]]:
+    """USD per million input and output tokens of a model or a dated snapshot of it, None if unknown."""
+    if model in OPENAI_PRICES_PER_MTOK:
+        return OPENAI_PRICES_PER_MTOK[model]
+    base, _, suffix = model.rpartition("-")
+    # Snapshots such as gpt-4o-mini-2024-07-18
+    while base and suffix.isdigit():
+        if base in OPENAI_PRICES_PER_MTOK:
+            return OPENAI_PRICES_PER_MTOK[base]
+        base, _, suffix = base.rpartition("-")
+    return None
+
+
+class UsageTurn(Base):
+    __tablename__ = 'usage_turns'
+
+    id = Column(Integer, primary_key=True)
+    token_id = Column(Integer, ForeignKey('auth_tokens.id'), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    session_id = Column(String, nullable=True)
+    # The client's idempotency key, which feedback refers to as its request_id
+    request_id = Column(String, nullable=True, index=True)
+    input_tokens = Column(Integer, default=0, nullable=False)
+    output_tokens = Column(Integer, default=0, nullable=False)
+    cache_read_tokens = Column(Integer, default=0, nullable=False)
+    cache_creation_tokens = Column(Integer, default=0, nullable=False)
+    cost_usd = Column(Float, default=0.0, nullable=False)
+    openai_input_tokens = Column(Integer, default=0, nullable=False)
+    openai_output_tokens = Column(Integer, default=0, nullable=False)
+    openai_cost_usd = Column(Float, default=0.0, nullable=False)
+    wall_seconds = Column(Float, default=0.0, nullable=False)
+    tool_calls = Column(Integer, default=0, nullable=False)
+
+
+class UsageDaily(Base):
+    __tablename__ = 'usage_daily'
+
+    token_id = Column(Integer, ForeignKey('auth_tokens.id'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    runs = Column(Integer, default=0, nullable=False)
+    input_tokens = Column(Integer, default=0, nullable=False)
+    output_tokens = Column(Integer, default=0, nullable=False)
+    cache_read_tokens = Column(Integer, default=0, nullable=False)
+    cache_creation_tokens = Column(Integer, default=0, nullable=False)
+    cost_usd = Column(Float, default=0.0, nullable=False)
+    openai_input_tokens = Column(Integer, default=0, nullable=False)
+    openai_output_tokens = Column(Integer, default=0, nullable=False)
+    openai_cost_usd = Column(Float, default=0.0, nullable=False)
+    wall_seconds = Column(Float, default=0.0, nullable=False)
+    tool_calls = Column(Integer, default=0, nullable=False)
+
+
+class TokenBudget(Base):
+    """Per-token overrides of the default limits from config (None = use the default)."""
+    __tablename__ = 'token_budgets'
+
+    token_id = Column(Integer, ForeignKey('auth_tokens.id'), primary_key=True)
+    daily_usd = Column(Float, nullable=True)
+    monthly_usd = Column(Float, nullable=True)
+    requests_per_minute = Column(Integer, nullable=True)
+
+
+@dataclass
+class TokenLimits:
+    # 0 = unlimited
+    daily_usd: float = 0.0
+    monthly_usd: float = 0.0
+    requests_per_minute: int = 0
+
+
+@dataclass
+class RunUsage:
+    """Usage of one Claude run, collected from its stream-json events."""
+    session_id: Optional[str] = None
+    request_id: Optional[str] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_creation_tokens: int = 0
+    cost_usd: float = 0.0
+    openai_input_tokens: int = 0
+    openai_output_tokens: int = 0
+    openai_cost_usd: float = 0.0
+    wall_seconds: float = 0.0
+    tool_calls: int = 0
+
+    def add_event(self, event: dict) -> None:
+        """Count tool calls of assistant events and usage of result events."""
+        event_type = event.get("type")
+        if event_type == "assistant":
+            content = event.get("message", {}).get("content", [])
+            self.tool_calls += sum(1 for item in content if item.get("type") == "tool_use")
+        elif event_type == "result":
+            usage = event.get("usage") or {}
+            self.session_id = event.get("session_id") or self.session_id
+            self.input_tokens += usage.get("input_tokens") or 0
+            self.output_tokens += usage.get("output_tokens") or 0
+            self.cache_read_tokens += usage.get("cache_read_input_tokens") or 0
+            self.cache_creation_tokens += usage.get("cache_creation_input_tokens") or 0
+            self.cost_usd += event.get("total_cost_usd") or 0.0
+
+    def add_openai(self, model: str, usage) -> None:
+        """Count the usage object of an OpenAI chat completion."""
+        if usage is None:
+            return
+        price = openai_price(model)
+        if price is None:
+            print(f"No price for OpenAI model {model}, its cost is not counted")
+            price = (0.0, 0.0)
+        input_price, output_price = price
+        self.openai_input_tokens += usage.prompt_tokens
+        self.openai_output_tokens += usage.completion_tokens
+        self.openai_cost_usd += (usage.prompt_tokens * input_price + usage.completion_tokens * output_price) / 1_000_000
+
+    def to_row(self) -> dict:
+        return {field: getattr(self, field) for field in ROLLUP_FIELDS}
+
+
+_engine = None
+
+
+def get_engine():
+    """Get SQLAlchemy engine, with WAL so reports and budget checks do not block writes."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(f"sqlite:///{DB_PATH}")
+
+        @event.listens_for(_engine, "connect")
+        def _set_wal(dbapi_connection, _record):
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    return _engine
+
+
+def get_session() -> Session:
+    """Get SQLAlchemy session."""
+    SessionLocal = sessionmaker(bind=get_engine())
+    return SessionLocal()
+
+
+def init_db():
+    """Initialize the database with the auth token and usage tables."""
+    engine = get_engine()
+    Base.metadata.create_all(engine)
+    # usage_turns created before request_id was recorded
+    with engine.begin() as connection:
+        columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(usage_turns)")}
+        if "request_id" not in columns:
+            connection.exec_driver_sql("ALTER TABLE usage_turns ADD COLUMN request_id VARCHAR")
+            connection.exec_driver_sql("CREATE INDEX ix_usage_turns_request_id ON usage_turns (request_id)")
+
+
+def record_run(token_id: int, usage: RunUsage) -> None:
+    """Store one run and add it to the token's daily rollup in one transaction."""
+    row = usage.to_row()
+    rollup = insert(UsageDaily).values(token_id=token_id, day=datetime.utcnow().date(), runs=1, **row)
+    rollup = rollup.on_conflict_do_update(
+        index_elements=['token_id', 'day'],
+        set_={field: getattr(UsageDaily, field) + rollup.excluded[field] for field in ('runs',) + ROLLUP_FIELDS}
+    )
+    with get_session() as session:
+        session.add(UsageTurn(token_id=token_id, session_id=usage.session_id, request_id=usage.request_id, **row))
+        session.execute(rollup)
+        session.commit()
+
+
+def spend(token_id: int, today: Optional[date] = None) -> tuple[float, float]:
+    """Return the token's (today, this month) spend in USD, Claude and OpenAI together."""
+    today = today or datetime.utcnow().date()
+    with get_session() as session:
+        rows = session.query(UsageDaily.day, UsageDaily.cost_usd + UsageDaily.openai_cost_usd).filter(
+            UsageDaily.token_id == token_id,
+            UsageDaily.day >= today.replace(day=1)
+        ).all()
+    day_usd = sum(cost for day, cost in rows if day == today)
+    return day_usd, sum(cost for _, cost in rows)
+
+
+def token_limits(token_id: int, defaults: TokenLimits) -> TokenLimits:
+    """The token's limits: its own overrides on top of the defaults."""
+    with get_session() as session:
+        budget = session.get(TokenBudget, token_id)
+    if budget is None:
+        return defaults
+    return TokenLimits(
+        daily_usd=defaults.daily_usd if budget.daily_usd is None else budget.daily_usd,
+        monthly_usd=defaults.monthly_usd if budget.monthly_usd is None else budget.monthly_usd,
+        requests_per_minute=defaults.requests_per_minute if budget.requests_per_minute is None else budget.requests_per_minute
+    )
+
+
+def set_budget(token_id: int, **fields) -> None:
+    """Set (or clear, with None) per-token overrides of daily_usd, monthly_usd and requests_per_minute."""
+    with get_session() as session:
+        budget = session.get(TokenBudget, token_id) or TokenBudget(token_id=token_id)
+        for name, value in fields.items():
+            setattr(budget, name, value)
+        session.add(budget)
+        session.commit()
+
+
+def check_limits(token_id: int, defaults: TokenLimits) -> Optional[str]:
+    """Return why a new run must be refused, or None; an allowed run counts against the rate limit."""
+    limits = token_limits(token_id, defaults)
+    if limits.daily_usd or limits.monthly_usd:
+        day_usd, month_usd = spend(token_id)
+        if limits.daily_usd and day_usd >= limits.daily_usd:
+            return f"Daily usage budget of ${limits.daily_usd:.2f} reached, try again tomorrow (UTC)"
+        if limits.monthly_usd and month_usd >= limits.monthly_usd:
+            return f"Monthly usage budget of ${limits.monthly_usd:.2f} reached"
+    if limits.requests_per_minute:
+        retry_after = shared_state.rate_limit(f"token:{token_id}", limits.requests_per_minute, 60)
+        if retry_after is not None:
+            return f"Too many requests, please try again in {math.ceil(retry_after)}s"
+    return None
+
+
+def top_consumers(days: int = 30, limit: int = 10) -> List[dict]:
+    """Tokens with the highest spend over the last `days` days (UTC), highest first."""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    cost = func.sum(UsageDaily.cost_usd + UsageDaily.openai_cost_usd)
+    with get_session() as session:
+        rows = session.query(
+            UsageDaily.token_id,
+            AuthToken.description,
+            func.sum(UsageDaily.runs),
+            func.sum(UsageDaily.input_tokens + UsageDaily.cache_read_tokens + UsageDaily.cache_creation_tokens),
+            func.sum(UsageDaily.output_tokens),
+            func.sum(UsageDaily.tool_calls),
+            func.sum(UsageDaily.wall_seconds),
+            cost
+        ).outerjoin(AuthToken, AuthToken.id == UsageDaily.token_id).filter(
+            UsageDaily.day >= since
+        ).group_by(UsageDaily.token_id, AuthToken.description).order_by(cost.desc()).limit(limit).all()
+    return [
+        {
+            "token_id": token_id,
+            "description": description,
+            "runs": runs,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "tool_calls": tool_calls,
+            "wall_seconds": wall_seconds,
+            "cost_usd": cost_usd
+        }
+        for token_id, description, runs, input_tokens, output_tokens, tool_calls, wall_seconds, cost_usd in rows
+    ]
@@ -0,0 +1,70 @@
+"""
+Memoised validation results for the MCP proxy.
+
+Local validation tools are pure functions of their arguments and the n8n-mcp
+version, so identical calls can reuse an earlier result. Results are kept in
+memory and in the shared state broker, so later turns and other sessions on
+the host benefit too.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+
+import shared_state
+
+
+# Validation tools whose result depends only on their arguments
+NODE_VALIDATION_TOOLS = {'validate_node_minimal', 'validate_node_operation'}
+WORKFLOW_VALIDATION_TOOLS = {
+    'validate_workflow', 'validate_workflow_connections', 'validate_workflow_expressions'
+}
+VALIDATION_TOOLS = NODE_VALIDATION_TOOLS | WORKFLOW_VALIDATION_TOOLS
+
+SHARED_TTL_SECONDS = 24 * 3600
+
+
+def canonical_hash(value) -> str:
+    """Hash a JSON value independently of key order and whitespace."""
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ValidationCache:
+    """LRU cache of validation results keyed by tool, backend version and argument hash."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._results: OrderedDict[tuple[str, str, str], list] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(tool_name: str, arguments: dict, backend_version: str) -> tuple[str, str, str]:
+        """Build the cache key; arguments carry the node config or workflow and the profile."""
+        return (tool_name, backend_version, canonical_hash(arguments))
+
+    def get(self, key: tuple[str, str, str]) -> list[str] | None:
+        """Return the cached result texts, marking them most recently used."""
+        result = self._results.get(key)
+        if result is None:
+            result = shared_state.cache_get("validation", "|".join(key))
+            if result is None:
+                self.misses += 1
+                return None
+            self._remember(key, result)
+        self._results.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def store(self, key: tuple[str, str, str], result: list[str]) -> None:
+        """Store result texts locally and in the shared state broker."""
+        self._remember(key, result)
+        shared_state.cache_set("validation", "|".join(key), result, ttl_seconds=SHARED_TTL_SECONDS)
+
+    def _remember(self, key: tuple[str, str, str], result: list[str]) -> None:
+        """Store a result in memory, evicting the least recently used entry if full."""
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
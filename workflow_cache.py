@@ -0,0 +1,222 @@
+"""
+Workflow snapshot cache for the MCP proxy.
+
+Keeps the last full workflow document seen per (api_url, workflow_id, API key)
+so that repeated n8n_get_workflow* calls within a session can be answered
+without another round trip to the n8n instance. Snapshots are also written to
+the shared state broker so the next turn's proxy starts warm; those are
+revalidated before use unless the /chat prefetcher fetched them moments ago.
+Keys include a hash of the API key, so a snapshot or prefetched result is only
+ever served to a caller holding the key it was fetched with.
+"""
+
+import hashlib
+import time
+from dataclasses import dataclass, field
+
+import shared_state
+
+
+# Read tools that can be answered from a cached full workflow document
+CACHEABLE_READ_TOOLS = {
+    'n8n_get_workflow', 'n8n_get_workflow_minimal', 'n8n_get_workflow_structure'
+}
+
+# Read tools whose responses contain a full workflow we can store
+SNAPSHOT_SOURCE_TOOLS = {'n8n_get_workflow', 'n8n_get_workflow_details'}
+
+# Any call to these tools invalidates the cached snapshot
+WORKFLOW_WRITE_TOOLS = {
+    'n8n_update_full_workflow', 'n8n_update_partial_workflow', 'n8n_delete_workflow'
+}
+
+SHARED_TTL_SECONDS = 3600
+
+# n8n_list_executions arguments (besides credentials) whose result the prefetcher stores
+PREFETCH_EXECUTIONS_LIMIT = 10
+
+
+@dataclass
+class WorkflowSnapshot:
+    workflow: dict
+    updated_at: str | None
+    validated_at: float = field(default_factory=time.monotonic)
+    # Fetched by the prefetcher and not yet served
+    prefetched: bool = False
+
+
+def api_key_hash(api_key: str | None) -> str:
+    """Short hash of an n8n API key, for cache keys that must not be shared across keys."""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+
+def _key(api_url: str, workflow_id: str, api_key: str | None) -> tuple[str, str, str]:
+    return (api_url, str(workflow_id), api_key_hash(api_key))
+
+
+class WorkflowCache:
+    """Cache of full workflow documents keyed by (api_url, workflow_id, API key hash)."""
+
+    def __init__(self, fresh_seconds: float = 10.0):
+        # Snapshots younger than this are served without revalidating updatedAt
+        self.fresh_seconds = fresh_seconds
+        self._snapshots: dict[tuple[str, str, str], WorkflowSnapshot] = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def get(self, api_url: str, api_key: str | None, workflow_id: str) -> WorkflowSnapshot | None:
+        """Return the cached snapshot fetched with this API key, if any."""
+        key = _key(api_url, workflow_id, api_key)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            workflow = shared_state.cache_get("workflow", "|".join(key))
+            if workflow is not None:
+                fresh_until = shared_state.cache_get("workflow_prefetch", "|".join(key))
+                if fresh_until:
+                    # Prefetched for this request: fresh until the prefetch window ends
+                    validated_at = time.monotonic() - self.fresh_seconds + (fresh_until - time.time())
+                else:
+                    # Unknown age, so force revalidation on first use
+                    validated_at = 0.0
+                snapshot = WorkflowSnapshot(
+                    workflow=workflow, updated_at=workflow.get("updatedAt"),
+                    validated_at=validated_at, prefetched=bool(fresh_until)
+                )
+                self._snapshots[key] = snapshot
+        if snapshot is None:
+            self.misses += 1
+        return snapshot
+
+    def is_fresh(self, snapshot: WorkflowSnapshot) -> bool:
+        """Check whether a snapshot can be served without revalidation."""
+        return time.monotonic() - snapshot.validated_at < self.fresh_seconds
+
+    def store(self, api_url: str, api_key: str | None, workflow: dict) -> None:
+        """Store a full workflow document fetched with api_key."""
+        workflow_id = workflow.get("id")
+        if not workflow_id:
+            return
+        key = _key(api_url, workflow_id, api_key)
+        self._snapshots[key] = WorkflowSnapshot(
+            workflow=workflow,
+            updated_at=workflow.get("updatedAt")
+        )
+        shared_state.cache_set("workflow", "|".join(key), workflow, ttl_seconds=SHARED_TTL_SECONDS)
+
+    def revalidate(self, api_url: str, api_key: str | None, workflow_id: str, updated_at: str | None) -> bool:
+        """Compare a fresh updatedAt against the snapshot; drop it if it changed."""
+        self.revalidations += 1
+        key = _key(api_url, workflow_id, api_key)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            return False
+        if updated_at is None or updated_at != snapshot.updated_at:
+            self.invalidate(api_url, workflow_id)
+            return False
+        snapshot.validated_at = time.monotonic()
+        return True
+
+    def invalidate(self, api_url: str, workflow_id: str | None = None) -> None:
+        """Drop one workflow's snapshots, or every snapshot for api_url if no ID is given, for all API keys."""
+        for key in [
+            key for key in self._snapshots
+            if key[0] == api_url and (workflow_id is None or key[1] == str(workflow_id))
+        ]:
+            del self._snapshots[key]
+        prefix = f"{api_url}|" if workflow_id is None else f"{api_url}|{workflow_id}|"
+        shared_state.cache_delete_prefix("workflow", prefix)
+        # A prefetch marker would let a snapshot stored after this write skip revalidation
+        shared_state.cache_delete_prefix("workflow_prefetch", prefix)
+
+
+def mark_prefetched(api_url: str, api_key: str, workflow_id: str, fresh_seconds: float) -> None:
+    """Let proxies holding api_key serve a just-stored snapshot without revalidating it for fresh_seconds."""
+    shared_state.cache_set(
+        "workflow_prefetch", "|".join(_key(api_url, workflow_id, api_key)), time.time() + fresh_seconds,
+        ttl_seconds=fresh_seconds
+    )
+    shared_state.counter_add("prefetch.workflows")
+
+
+def _prefetched_executions_key(api_url: str, arguments: dict) -> str | None:
+    """Key of the prefetched executions matching a n8n_list_executions call, if it can match at all."""
+    if set(arguments) - {"workflowId", "limit", "apiUrl", "apiKey"} or not arguments.get("workflowId"):
+        return None
+    try:
+        if int(arguments.get("limit")) != PREFETCH_EXECUTIONS_LIMIT:
+            return None
+    except (TypeError, ValueError):
+        return None
+    return "|".join(_key(api_url, arguments["workflowId"], arguments.get("apiKey")))
+
+
+def store_prefetched_executions(api_url: str, api_key: str, workflow_id: str, texts: list[str], fresh_seconds: float) -> None:
+    """Store the result of the prefetcher's n8n_list_executions call, for callers holding api_key."""
+    shared_state.cache_set(
+        "executions_prefetch", "|".join(_key(api_url, workflow_id, api_key)), texts, ttl_seconds=fresh_seconds
+    )
+    shared_state.counter_add("prefetch.executions")
+
+
+def take_prefetched_executions(api_url: str, arguments: dict) -> list[str] | None:
+    """Return and drop prefetched executions for an identical n8n_list_executions call."""
+    key = _prefetched_executions_key(api_url, arguments)
+    if key is None:
+        return None
+    texts = shared_state.cache_get("executions_prefetch", key)
+    if texts is None:
+        return None
+    # Executions change quickly, so a prefetched list is served once
+    shared_state.cache_delete("executions_prefetch", key)
+    record_prefetch_hit()
+    return texts
+
+
+def record_prefetch_hit() -> None:
+    shared_state.counter_add("prefetch.hits")
+
+
+def minimal_view(workflow: dict) -> dict:
+    """Build the n8n_get_workflow_minimal payload from a full workflow."""
+    return {
+        "id": workflow.get("id"),
+        "name": workflow.get("name"),
+        "active": workflow.get("active"),
+        "tags": workflow.get("tags") or [],
+        "createdAt": workflow.get("createdAt"),
+        "updatedAt": workflow.get("updatedAt")
+    }
+
+
+def structure_view(workflow: dict) -> dict:
+    """Build the n8n_get_workflow_structure payload from a full workflow."""
+    nodes = workflow.get("nodes") or []
+    connections = workflow.get("connections") or {}
+    return {
+        "id": workflow.get("id"),
+        "name": workflow.get("name"),
+        "active": workflow.get("active"),
+        "nodes": [
+            {
+                "id": node.get("id"),
+                "name": node.get("name"),
+                "type": node.get("type"),
+                "position": node.get("position"),
+                "disabled": node.get("disabled") or False
+            }
+            for node in nodes
+        ],
+        "connections": connections,
+        "nodeCount": len(nodes),
+        "connectionCount": len(connections)
+    }
+
+
+def workflow_view(tool_name: str, workflow: dict) -> dict:
+    """Render the response payload of a cacheable read tool."""
+    if tool_name == 'n8n_get_workflow_minimal':
+        return minimal_view(workflow)
+    if tool_name == 'n8n_get_workflow_structure':
+        return structure_view(workflow)
+    return workflow
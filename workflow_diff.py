@@ -0,0 +1,155 @@
+"""
+Turn n8n_update_full_workflow arguments into n8n_update_partial_workflow operations.
+
+The diff is computed against the cached current version of the workflow. When
+the change cannot be expressed unambiguously as diff operations, diff_workflow
+returns None and the caller sends the full update unchanged.
+"""
+
+# n8n_update_partial_workflow rejects requests with more operations than this
+MAX_DIFF_OPERATIONS = 5
+
+# Arguments of n8n_update_full_workflow that the diff understands
+_DIFFABLE_ARGUMENTS = {'id', 'name', 'nodes', 'connections', 'settings', 'apiUrl', 'apiKey'}
+
+# Node keys that identify a node rather than configure it
+_NODE_IDENTITY_KEYS = {'id', 'name', 'type'}
+
+
+def _index_nodes(nodes: list) -> dict[str, dict] | None:
+    """Index nodes by ID; None if IDs or names are missing or duplicated."""
+    by_id = {}
+    names = set()
+    for node in nodes:
+        if not isinstance(node, dict):
+            return None
+        node_id = node.get("id")
+        name = node.get("name")
+        if not node_id or not name or node_id in by_id or name in names:
+            return None
+        by_id[node_id] = node
+        names.add(name)
+    return by_id
+
+
+def _flatten_connections(connections: dict) -> list[tuple] | None:
+    """Flatten n8n connections into (source, sourceOutput, sourceIndex, target, targetInput, targetIndex)."""
+    edges = []
+    if not isinstance(connections, dict):
+        return None
+    for source, outputs in connections.items():
+        if not isinstance(outputs, dict):
+            return None
+        for output_type, slots in outputs.items():
+            if not isinstance(slots, list):
+                return None
+            for source_index, targets in enumerate(slots):
+                for target in targets or []:
+                    if not isinstance(target, dict) or "node" not in target:
+                        return None
+                    edges.append((
+                        source, output_type, source_index,
+                        target["node"], target.get("type", "main"), target.get("index", 0)
+                    ))
+    return edges
+
+
+def _node_changes(old: dict, new: dict) -> dict | None:
+    """Top-level node keys that changed; None if a key was removed."""
+    changes = {}
+    for key in set(old) | set(new):
+        if key in _NODE_IDENTITY_KEYS:
+            continue
+        if key not in new:
+            # updateNode can set values but not delete them
+            return None
+        if old.get(key) != new[key]:
+            changes[key] = new[key]
+    return changes
+
+
+def diff_workflow(current: dict, update: dict) -> list[dict] | None:
+    """Compute the partial update operations that turn current into update."""
+    if set(update) - _DIFFABLE_ARGUMENTS:
+        return None
+    if "nodes" not in update or "connections" not in update:
+        return None
+
+    old_nodes = _index_nodes(current.get("nodes") or [])
+    new_nodes = _index_nodes(update["nodes"] or [])
+    if old_nodes is None or new_nodes is None:
+        return None
+
+    operations = []
+
+    removed_names = set()
+    for node_id, node in old_nodes.items():
+        if node_id not in new_nodes:
+            removed_names.add(node["name"])
+            operations.append({"type": "removeNode", "nodeId": node_id})
+
+    for node_id, node in new_nodes.items():
+        old = old_nodes.get(node_id)
+        if old is None:
+            operations.append({"type": "addNode", "node": node})
+            continue
+        # Renames and type changes ripple through connections; send those in full
+        if old.get("name") != node.get("name") or old.get("type") != node.get("type"):
+            return None
+        changes = _node_changes(old, node)
+        if changes is None:
+            return None
+        if changes:
+            operations.append({"type": "updateNode", "nodeId": node_id, "changes": changes})
+
+    old_edges = _flatten_connections(current.get("connections") or {})
+    new_edges = _flatten_connections(update["connections"] or {})
+    if old_edges is None or new_edges is None:
+        return None
+
+    new_edge_set = set(new_edges)
+    old_edge_set = set(old_edges)
+    for edge in old_edges:
+        source, output_type, _, target, input_type, _ = edge
+        if edge in new_edge_set or source in removed_names or target in removed_names:
+            continue
+        # removeConnection does not take indices, so parallel edges are ambiguous
+        parallel = [e for e in old_edges if (e[0], e[1], e[3], e[4]) == (source, output_type, target, input_type)]
+        if len(parallel) > 1:
+            return None
+        operations.append({
+            "type": "removeConnection",
+            "source": source,
+            "target": target,
+            "sourceOutput": output_type,
+            "targetInput": input_type
+        })
+    for edge in new_edges:
+        source, output_type, source_index, target, input_type, target_index = edge
+        # removeNode drops the removed node's connections, also for a replacement under the same name
+        if edge in old_edge_set and source not in removed_names and target not in removed_names:
+            continue
+        operations.append({
+            "type": "addConnection",
+            "source": source,
+            "target": target,
+            "sourceOutput": output_type,
+            "targetInput": input_type,
+            "sourceIndex": source_index,
+            "targetIndex": target_index
+        })
+
+    if "settings" in update:
+        old_settings = current.get("settings") or {}
+        new_settings = update["settings"] or {}
+        if set(old_settings) - set(new_settings):
+            return None
+        if old_settings != new_settings:
+            operations.append({"type": "updateSettings", "settings": new_settings})
+
+    if "name" in update and update["name"] != current.get("name"):
+        operations.append({"type": "updateName", "name": update["name"]})
+
+    if not operations or len(operations) > MAX_DIFF_OPERATIONS:
+        return None
+    return operations
@@ -0,0 +1,68 @@
+"""
+Speculative prefetch of the workflow the user is looking at.
+
+Claude's first step on a workflow page is nearly always to fetch that workflow.
+While /chat is still authenticating and spawning claude, the prefetcher fetches
+the workflow and its recent executions through the long-lived n8n-mcp client
+owned by the worker. The results land in the shared state broker, where the
+run's proxy finds them and answers the first calls without a round trip.
+"""
+
+import asyncio
+import re
+from typing import Callable, Optional
+
+import shared_state
+
+WORKFLOW_URL_PATTERN = re.compile(r"/workflow/([A-Za-z0-9_-]+)")
+
+
+def workflow_id_from_url(url: Optional[str]) -> Optional[str]:
+    """Extract the workflow ID from an n8n editor URL."""
+    if not url:
+        return None
+    match = WORKFLOW_URL_PATTERN.search(url)
+    if not match or match.group(1) == "new":
+        return None
+    return match.group(1)
+
+
+def prefetch_stats() -> dict:
+    """Prefetch counters across all workers, with hit rate and wasted fetches."""
+    counters = shared_state.counters("prefetch.")
+    fetched = counters.get("prefetch.workflows", 0) + counters.get("prefetch.executions", 0)
+    hits = counters.get("prefetch.hits", 0)
+    return {
+        "fetched": fetched,
+        "hits": hits,
+        "wasted": max(fetched - hits, 0),
+        "failed": counters.get("prefetch.failed", 0),
+        "hitRate": round(hits / fetched, 3) if fetched else None
+    }
+
+
+class WorkflowPrefetcher:
+    """Runs prefetches in the background through the worker's n8n-mcp client."""
+
+    def __init__(self, fresh_seconds: float, get_client: Callable):
+        self.fresh_seconds = fresh_seconds
+        self.get_client = get_client
+        self.tasks: set = set()
+
+    def start(self, api_url: str, api_key: str, workflow_id: str) -> asyncio.Task:
+        """Start prefetching in the background."""
+        task = asyncio.create_task(self._prefetch(api_url, api_key, workflow_id))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _prefetch(self, api_url: str, api_key: str, workflow_id: str) -> None:
+        try:
+            await self.get_client().prefetch_workflow(api_url, api_key, workflow_id, self.fresh_seconds)
+        except Exception as e:
+            await asyncio.to_thread(shared_state.counter_add, "prefetch.failed")
+            print(f"Error prefetching workflow {workflow_id}: {e}")
+
+    def close(self) -> None:
+        for task in self.tasks:
+            task.cancel()